@@ -0,0 +1,134 @@
+"""
+Precomputed aggregate tables ("cubes") derived from the processed datasets.
+
+Each weather cube is a wide table with one column per event type and a
+sorted integer index (Year or Decade), so a year-range query is an index
+slice rather than a groupby over the raw records.
+
+Temperature anomalies are kept at four resolutions (monthly, seasonal,
+annual and decadal), all derived from the monthly values of the GISS table
+in one pass, so the temperature chart can switch resolution with the zoom
+level without resampling per request.
+"""
+import numpy as np
+import pandas as pd
+
+# Cube name -> index column, in the order they are derived
+WEATHER_CUBES = {
+    'weather_by_year': 'Year',
+    'weather_by_decade': 'Decade',
+    'weather_cumulative': 'Year'
+}
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+          'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# Meteorological seasons; DJF takes December from the previous year
+SEASONS = ['DJF', 'MAM', 'JJA', 'SON']
+
+# Temperature resolution -> dataset name, finest first
+TEMPERATURE_RESOLUTIONS = {
+    'monthly': 'temperature_monthly',
+    'seasonal': 'temperature_seasonal',
+    'annual': 'temperature',
+    'decadal': 'temperature_decadal'
+}
+
+
+def build_weather_cubes(weather_df):
+    """
+    Aggregate raw weather event records into the WEATHER_CUBES tables:
+    counts by year x event type, by decade x event type, and cumulative
+    totals by year x event type
+    """
+    by_year = weather_df.pivot_table(index='Year', columns='Event_Type', values='Count',
+                                     aggfunc='sum', fill_value=0, observed=True).sort_index()
+    by_year.columns = [str(column) for column in by_year.columns]
+    by_year.index = by_year.index.astype('int64')
+    by_year.index.name = 'Year'
+
+    by_decade = by_year.groupby((by_year.index // 10) * 10).sum()
+    by_decade.index.name = 'Decade'
+
+    cumulative = by_year.cumsum()
+
+    return {
+        'weather_by_year': by_year,
+        'weather_by_decade': by_decade,
+        'weather_cumulative': cumulative
+    }
+
+
+def period_dates(years, months=1, days=1):
+    """
+    datetime64[s] dates for arrays of years, months (1-12) and days of the
+    month. Second precision, unlike pandas' default nanoseconds, represents
+    any year without overflowing.
+    """
+    months = (np.asarray(years, dtype='int64') - 1970) * 12 + np.asarray(months, dtype='int64') - 1
+    return (months.astype('datetime64[M]').astype('datetime64[D]') +
+            np.asarray(days, dtype='int64') - 1).astype('datetime64[s]')
+
+
+def decadal_temperatures(annual_df):
+    """Mean of the annual values of each decade, dated to its middle"""
+    decades = (annual_df['Year'].to_numpy('int64') // 10) * 10
+    decadal = annual_df.groupby(decades)['Temperature'].mean().reset_index()
+    decadal.columns = ['Decade', 'Temperature']
+    decadal.insert(1, 'Date', period_dates(decadal['Decade'] + 5))
+    return decadal
+
+
+def build_temperature_resolutions(giss_df):
+    """
+    Monthly, seasonal, annual and decadal anomalies from a GISS-style table
+    (Year, Jan..Dec and the upstream J-D/D-N/season aggregates, which are
+    ignored). Seasons and years are only computed when all their months
+    are present, matching the upstream aggregates. Returns the tables keyed
+    by dataset name (see TEMPERATURE_RESOLUTIONS), each sorted by date.
+    """
+    # Drops repeated header lines and footnotes
+    years = pd.to_numeric(giss_df['Year'], errors='coerce')
+    table = giss_df[years.notna()].assign(Year=years[years.notna()].astype('int64')) \
+        .sort_values('Year')
+    years = table['Year'].to_numpy()
+    # years x 12 matrix in calendar order; '***' placeholders become NaN
+    values = table[MONTHS].apply(pd.to_numeric, errors='coerce').to_numpy('float64')
+    n_years = len(years)
+
+    months = np.tile(np.arange(1, 13), n_years)
+    month_years = np.repeat(years, 12)
+    flat = values.ravel()
+    present = ~np.isnan(flat)
+    monthly = pd.DataFrame({
+        'Year': month_years[present],
+        'Month': months[present],
+        'Date': period_dates(month_years[present], months[present], 15),
+        'Temperature': flat[present]
+    })
+
+    # Shifting the monthly sequence by one puts each year's previous December
+    # first, so every block of three is one season: DJF, MAM, JJA, SON
+    shifted = np.concatenate([[np.nan], flat[:-1]]).reshape(n_years, 4, 3)
+    seasonal_values = shifted.mean(axis=2).ravel()
+    season_years = np.repeat(years, 4)
+    season_index = np.tile(np.arange(4), n_years)
+    complete = ~np.isnan(seasonal_values)
+    seasonal = pd.DataFrame({
+        'Year': season_years[complete],
+        'Season': pd.Categorical.from_codes(season_index[complete], categories=SEASONS),
+        # Dated to the middle month of the season: Jan, Apr, Jul, Oct
+        'Date': period_dates(season_years[complete], season_index[complete] * 3 + 1, 15),
+        'Temperature': seasonal_values[complete]
+    })
+
+    annual_values = values.mean(axis=1)
+    complete = ~np.isnan(annual_values)
+    annual = pd.DataFrame({'Year': years[complete], 'Temperature': annual_values[complete]})
+
+    return {
+        'temperature_monthly': monthly,
+        'temperature_seasonal': seasonal,
+        'temperature': annual,
+        'temperature_decadal': decadal_temperatures(annual)
+    }
@@ -0,0 +1,308 @@
+"""
+Read-only HTTP API over the processed datasets.
+
+    GET /api                                    datasets and their filters
+    GET /api/emissions?countries=China,India&from=1990&to=2020
+    GET /api/weather?event_types=Flood&format=arrow
+    GET /api/temperature_monthly?from=2000&limit=0
+
+Rows come from the data_store registry the dashboards use, or from the
+embedded database for the full `owid` table and the tables it serves when
+one is built. They are streamed as NDJSON (default) or an Arrow IPC stream
+(format=arrow or Accept: application/vnd.apache.arrow.stream), CHUNK_ROWS
+rows at a time, so a full export is never serialized in one piece. Pages are `limit` rows
+from `offset` (limit=0 for everything) with the total in X-Total-Count and
+a Link: rel="next" header. The ETag is derived from the dataset version and
+the query, and the body is gzip-compressed on the fly when the client
+accepts it (flask-compress would buffer a streamed response whole).
+"""
+import hashlib
+import io
+import os
+import zlib
+from urllib.parse import urlencode
+
+import numpy as np
+
+import data_store
+import database
+from data_store import DISPLAY_PRECISION
+from instrumentation import get_logger, metrics
+
+logger = get_logger('api')
+
+# Rows per page when the request does not set `limit`
+PAGE_SIZE = int(os.environ.get('CLIMATE_API_PAGE_SIZE', 50000))
+
+# Rows serialized per streamed chunk
+CHUNK_ROWS = 5000
+
+NDJSON = 'application/x-ndjson'
+# Declared SQLite column type (as written by DataFrame.to_sql) -> Arrow type
+SQLITE_ARROW_TYPES = {'INTEGER': 'int64', 'REAL': 'double', 'TEXT': 'string',
+                      'TIMESTAMP': 'timestamp[s]'}
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+
+# Dataset -> (entity column, query parameter selecting entities, x column)
+API_DATASETS = {
+    'emissions': ('country', 'countries', 'year'),
+    'geo': ('country', 'countries', 'year'),
+    'weather': ('Event_Type', 'event_types', 'Year'),
+    'temperature': (None, None, 'Year'),
+    'temperature_monthly': (None, None, 'Year'),
+    'temperature_seasonal': (None, None, 'Year'),
+    'temperature_decadal': (None, None, 'Decade'),
+    database.OWID_TABLE: ('country', 'countries', 'year')
+}
+
+metrics.describe('dashboard_api_requests_total', 'counter',
+                 'Data API requests by dataset, format and status')
+metrics.describe('dashboard_api_rows_total', 'counter',
+                 'Rows streamed by the data API')
+
+
+class BadRequest(ValueError):
+    """Invalid query parameters, answered with 400"""
+
+
+class DatasetNotFound(Exception):
+    """A known dataset that is not available in this deployment, answered with 404"""
+
+
+def _int_param(args, name, default=None):
+    value = args.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer, got {value!r}")
+
+
+def _list_param(args, name):
+    values = [v.strip() for item in args.getlist(name) for v in item.split(',')]
+    return [v for v in values if v] or None
+
+
+def parse_query(dataset, args):
+    """Filters and page of a request: {keys, years, offset, limit, columns}"""
+    key, key_param, _ = API_DATASETS[dataset]
+    offset = _int_param(args, 'offset', 0)
+    limit = _int_param(args, 'limit', PAGE_SIZE)
+    if offset < 0 or limit < 0:
+        raise BadRequest("offset and limit must not be negative")
+    return {
+        'keys': _list_param(args, key_param) if key else None,
+        'years': [_int_param(args, 'from', -32768), _int_param(args, 'to', 32767)],
+        'offset': offset,
+        'limit': limit,
+        'columns': _list_param(args, 'columns')
+    }
+
+
+def frame_rows(dataset, query):
+    """
+    (frame, row positions, total) for a dataset in the registry. Only the
+    matching positions are computed; rows are taken chunk by chunk later.
+    """
+    source = data_store.registry.get(dataset)
+    key, _, x = API_DATASETS[dataset]
+    df = source
+    if query['columns']:
+        unknown = [column for column in query['columns'] if column not in source.columns]
+        if unknown:
+            raise BadRequest(f"Unknown columns {unknown}")
+        df = source[query['columns']]
+
+    mask = np.ones(len(source), dtype=bool)
+    # Data written before the dataset had an x column (e.g. a geo snapshot
+    # without years) has nothing to filter by year
+    if x in source.columns:
+        mask &= ((source[x] >= query['years'][0]) & (source[x] <= query['years'][1])).to_numpy()
+    if query['keys']:
+        mask &= source[key].isin(query['keys']).to_numpy()
+    positions = np.flatnonzero(mask)
+    stop = len(positions) if not query['limit'] else query['offset'] + query['limit']
+    return df, positions[query['offset']:stop], len(positions)
+
+
+def frame_chunks(df, positions):
+    """DataFrame chunks of the selected rows, CHUNK_ROWS at a time (at least one)"""
+    for start in range(0, max(len(positions), 1), CHUNK_ROWS):
+        chunk = df.take(positions[start:start + CHUNK_ROWS])
+        # Plain strings, so every Arrow batch has the same schema
+        categorical = chunk.select_dtypes('category').columns
+        yield chunk.astype({column: 'object' for column in categorical}) if len(categorical) else chunk
+
+
+def database_rows(dataset, query):
+    """
+    (chunk iterator, Arrow schema, total) for a table read from the
+    embedded database. The schema follows the declared column types, since
+    a chunk whose values are all NULL would not reveal them.
+    """
+    path = data_store.database_path()
+    if path is None:
+        raise DatasetNotFound(f"{dataset} is only served from the embedded database")
+    key, _, x = API_DATASETS[dataset]
+    where, params = [f"{x} BETWEEN ? AND ?"], list(query['years'])
+    if query['keys']:
+        where.append(f"{key} IN ({database.placeholders(query['keys'])})")
+        params += query['keys']
+    where = ' AND '.join(where)
+
+    declared = dict(data_store.query(f"SELECT name, type FROM pragma_table_info('{dataset}')")
+                    .itertuples(index=False))
+    columns = query['columns'] or list(declared)
+    unknown = [column for column in columns if column not in declared]
+    if unknown:
+        raise BadRequest(f"Unknown columns {unknown}")
+    schema = [(column, SQLITE_ARROW_TYPES.get(declared[column].upper(), 'string'))
+              for column in columns]
+    columns = ', '.join(f'"{column}"' for column in columns)
+
+    total = int(data_store.query(f"SELECT COUNT(*) FROM {dataset} WHERE {where}", params).iloc[0, 0])
+    sql = f"SELECT {columns} FROM {dataset} WHERE {where} ORDER BY {key}, {x} LIMIT ? OFFSET ?"
+    params += [query['limit'] or -1, query['offset']]
+    chunks = database.query_chunks(path, sql, params, CHUNK_ROWS, version=data_store.registry.version())
+    return chunks, schema, total
+
+
+def ndjson_body(chunks):
+    """One JSON object per row, floats at the display precision the data was saved with"""
+    for chunk in chunks:
+        # An empty frame would serialize as a lone newline
+        if chunk.empty:
+            continue
+        yield chunk.to_json(orient='records', lines=True, date_format='iso',
+                            double_precision=DISPLAY_PRECISION).encode('utf-8')
+
+
+def arrow_body(chunks, schema=None):
+    """
+    Arrow IPC stream of the chunks, flushed batch by batch. Without a
+    schema (a list of (name, type name) pairs) the first chunk's is used.
+    """
+    import pyarrow as pa
+
+    if schema is not None:
+        schema = pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in schema])
+    sink = io.BytesIO()
+    writer = None
+    for chunk in chunks:
+        batch = pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False)
+        if writer is None:
+            schema = batch.schema
+            writer = pa.ipc.new_stream(sink, schema)
+        writer.write_batch(batch)
+        yield _drain(sink)
+    if writer is not None:
+        writer.close()
+        yield _drain(sink)
+
+
+def _drain(buffer):
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def gzip_body(body, level=6):
+    """Compress a streamed body chunk by chunk (gzip framing, wbits=31)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for data in body:
+        compressed = compressor.compress(data)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def etag(dataset, args, fmt, coding):
+    """
+    Strong validator of one representation: the dataset version, the
+    normalized query, the body format and the content coding
+    """
+    digest = hashlib.sha256()
+    for part in (data_store.dataset_version(), dataset, fmt, coding):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(urlencode(sorted(args.items(multi=True))).encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+
+def register_api(server, prefix='/api'):
+    """Add the data API routes to a Flask server"""
+    from flask import Response, jsonify, request
+
+    def error(status, message, dataset='unknown', fmt='unknown'):
+        metrics.inc('dashboard_api_requests_total', dataset=dataset, format=fmt, status=status)
+        response = jsonify(error=message)
+        response.status_code = status
+        return response
+
+    def index_view():
+        return jsonify(datasets={
+            name: {'filters': [param for param in (key_param, 'from', 'to', 'columns') if param],
+                   'x': x}
+            for name, (_, key_param, x) in API_DATASETS.items()
+        }, formats=['ndjson', 'arrow'], page_size=PAGE_SIZE)
+
+    def dataset_view(dataset):
+        if dataset not in API_DATASETS:
+            return error(404, f"Unknown dataset {dataset!r}")
+        fmt = request.args.get('format') or \
+            ('arrow' if request.accept_mimetypes.best == ARROW_STREAM else 'ndjson')
+        if fmt not in ('ndjson', 'arrow'):
+            return error(400, f"Unknown format {fmt!r}", dataset)
+
+        coding = 'gzip' if 'gzip' in request.accept_encodings else 'identity'
+        tag = etag(dataset, request.args, fmt, coding)
+        vary = 'Accept, Accept-Encoding'
+        if tag in request.if_none_match:
+            metrics.inc('dashboard_api_requests_total', dataset=dataset, format=fmt, status=304)
+            return Response(status=304, headers={'ETag': f'"{tag}"', 'Vary': vary})
+
+        try:
+            query = parse_query(dataset, request.args)
+            if dataset == database.OWID_TABLE or (dataset in data_store.DATABASE_TABLES
+                                                  and data_store.database_path()):
+                chunks, schema, total = database_rows(dataset, query)
+                returned = max(min(total - query['offset'], query['limit'] or total), 0)
+            else:
+                if not data_store.registry.exists(dataset):
+                    # e.g. an OPTIONAL_DATASETS table in data written before it existed
+                    raise DatasetNotFound(f"{dataset} is not available")
+                df, positions, total = frame_rows(dataset, query)
+                chunks, schema, returned = frame_chunks(df, positions), None, len(positions)
+        except BadRequest as e:
+            return error(400, str(e), dataset, fmt)
+        except DatasetNotFound as e:
+            return error(404, str(e), dataset, fmt)
+
+        body = arrow_body(chunks, schema) if fmt == 'arrow' else ndjson_body(chunks)
+        headers = {
+            'ETag': f'"{tag}"',
+            'Cache-Control': 'no-cache',
+            'X-Total-Count': str(total),
+            'Vary': vary
+        }
+        end = query['offset'] + returned
+        if query['limit'] and end < total:
+            args = request.args.to_dict(flat=False)
+            args['offset'] = [str(end)]
+            headers['Link'] = f'<{request.base_url}?{urlencode(args, doseq=True)}>; rel="next"'
+        if coding == 'gzip':
+            body = gzip_body(body)
+            headers['Content-Encoding'] = 'gzip'
+
+        metrics.inc('dashboard_api_requests_total', dataset=dataset, format=fmt, status=200)
+        metrics.inc('dashboard_api_rows_total', returned, dataset=dataset)
+        logger.info("API export", extra={'fields': {
+            'dataset': dataset, 'format': fmt, 'rows': returned, 'total': total}})
+        return Response(body, mimetype=ARROW_STREAM if fmt == 'arrow' else NDJSON,
+                        headers=headers)
+
+    server.add_url_rule(prefix, 'api_index', index_view)
+    server.add_url_rule(f"{prefix}/<dataset>", 'api_dataset', dataset_view)
+    return server
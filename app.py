@@ -1,140 +1,127 @@
-print("Starting application...")
-
 import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output
-import plotly.express as px
 import plotly.graph_objects as go
-import pandas as pd
-import numpy as np
 import dash_bootstrap_components as dbc
 import os
 import sys
-import traceback
-import webbrowser
-from threading import Timer
 
-# Initialize the Dash app with a modern theme
-try:
-    print("Initializing Dash app...")
-    app = dash.Dash(
-        __name__, 
-        external_stylesheets=[dbc.themes.BOOTSTRAP],
-        suppress_callback_exceptions=True
-    )
-    app.title = 'Climate Change Impact Dashboard'
-    print("Dash app created successfully")
-except Exception as e:
-    print(f"Error creating Dash app: {e}")
-    traceback.print_exc()
-    sys.exit(1)
+import data_store
+import rendering
+from api import register_api
+from compression import register_compression
+from instrumentation import configure_logging, get_logger, register_metrics, timer
+from startup import register_health, warm_up
+
+configure_logging()
+logger = get_logger('app')
+logger.info("Starting application")
 
 # Load the processed data
 def load_data():
     """Load data with error handling"""
     try:
-        print("Loading data files...")
-        data_files = {
-            'temperature': 'data/temperature_data.csv',
-            'emissions': 'data/emissions_data.csv',
-            'weather': 'data/weather_events.csv',
-            'geo': 'data/geographic_data.csv'
-        }
+        data_files = {name: data_store.registry.path(name)
+                      for name in ('temperature', 'emissions', 'weather', 'geo')}
         
-        # Check if files exist
+        # Check if files exist (CSV or its columnar copy)
         for name, file_path in data_files.items():
-            if not os.path.exists(file_path):
-                print(f"Error: {file_path} not found")
+            if not (os.path.exists(file_path)
+                    or os.path.exists(data_store.columnar_path(file_path))):
+                logger.error("Data file not found", extra={'fields': {'path': file_path}})
                 return None, None, None, None
-            print(f"Found {name} data file")
         
         # Load each file with error handling
         try:
-            temp_df = pd.read_csv(data_files['temperature'])
-            print("Temperature data loaded successfully")
+            with timer('dashboard_dataset_load_seconds', dataset='temperature'):
+                temp_df = data_store.read_dataset(data_files['temperature'], 'temperature')
+            logger.info("Dataset loaded", extra={'fields': {'dataset': 'temperature', 'rows': len(temp_df)}})
         except Exception as e:
-            print(f"Error loading temperature data: {e}")
+            logger.error("Error loading dataset", extra={'fields': {'dataset': 'temperature', 'error': e}})
             return None, None, None, None
             
         try:
-            emissions_df = pd.read_csv(data_files['emissions'])
-            print("Emissions data loaded successfully")
+            with timer('dashboard_dataset_load_seconds', dataset='emissions'):
+                emissions_df = data_store.read_dataset(data_files['emissions'], 'emissions')
+            logger.info("Dataset loaded", extra={'fields': {'dataset': 'emissions', 'rows': len(emissions_df)}})
         except Exception as e:
-            print(f"Error loading emissions data: {e}")
+            logger.error("Error loading dataset", extra={'fields': {'dataset': 'emissions', 'error': e}})
             return None, None, None, None
             
         try:
-            weather_df = pd.read_csv(data_files['weather'])
-            print("Weather data loaded successfully")
+            with timer('dashboard_dataset_load_seconds', dataset='weather'):
+                weather_df = data_store.read_dataset(data_files['weather'], 'weather')
+            logger.info("Dataset loaded", extra={'fields': {'dataset': 'weather', 'rows': len(weather_df)}})
         except Exception as e:
-            print(f"Error loading weather data: {e}")
+            logger.error("Error loading dataset", extra={'fields': {'dataset': 'weather', 'error': e}})
             return None, None, None, None
             
         try:
-            geo_df = pd.read_csv(data_files['geo'])
-            print("Geographic data loaded successfully")
+            with timer('dashboard_dataset_load_seconds', dataset='geo'):
+                geo_df = data_store.read_dataset(data_files['geo'], 'geo')
+            logger.info("Dataset loaded", extra={'fields': {'dataset': 'geo', 'rows': len(geo_df)}})
         except Exception as e:
-            print(f"Error loading geographic data: {e}")
+            logger.error("Error loading dataset", extra={'fields': {'dataset': 'geo', 'error': e}})
             return None, None, None, None
             
         return temp_df, emissions_df, weather_df, geo_df
     except Exception as e:
-        print(f"Error in load_data: {e}")
-        traceback.print_exc()
+        logger.exception("Error in load_data")
         return None, None, None, None
 
-print("Loading data...")
-temp_df, emissions_df, weather_df, geo_df = load_data()
+def build_layout(temp_df, emissions_df, weather_df, geo_df):
+    """Build the figures and the dashboard layout from the loaded data"""
+    import plotly.express as px
 
-try:
-    # Check if any of the dataframes is None
     if any(df is None for df in [temp_df, emissions_df, weather_df, geo_df]):
-        print("Error: Could not load required data files.")
-        app.layout = html.Div([
+        logger.error("Could not load required data files")
+        return html.Div([
             html.H1("Error Loading Dashboard",
                    className="text-center text-danger mb-4"),
             html.P("Could not load required data files. Please check the console for error messages.",
                    className="text-center")
         ])
     else:
-        print("Data loaded successfully, setting up dashboard layout...")
+        logger.info("Data loaded, setting up dashboard layout")
         
         # Create figures with error handling
         try:
-            temp_fig = px.line(temp_df, x='Year', y='Temperature',
-                             color='Type',
-                             title='Global Temperature Trends')
-            print("Temperature figure created successfully")
+            with timer('dashboard_figure_build_seconds', figure='temperature'):
+                temp_df = temp_df.assign(Temperature=rendering.display_values(temp_df['Temperature']))
+                temp_fig = px.line(temp_df, x='Year', y='Temperature',
+                                 color='Type',
+                                 title='Global Temperature Trends')
         except Exception as e:
-            print(f"Error creating temperature figure: {e}")
+            logger.error("Error creating figure", extra={'fields': {'figure': 'temperature', 'error': e}})
             temp_fig = go.Figure()
             
         try:
-            emissions_fig = px.line(emissions_df,
-                                  x='year',
-                                  y='co2',
-                                  color='country',
-                                  title='CO2 Emissions Over Time')
-            print("Emissions figure created successfully")
+            with timer('dashboard_figure_build_seconds', figure='emissions'):
+                emissions_df = emissions_df.assign(co2=rendering.display_values(emissions_df['co2']))
+                emissions_fig = px.line(emissions_df,
+                                      x='year',
+                                      y='co2',
+                                      color='country',
+                                      title='CO2 Emissions Over Time')
         except Exception as e:
-            print(f"Error creating emissions figure: {e}")
+            logger.error("Error creating figure", extra={'fields': {'figure': 'emissions', 'error': e}})
             emissions_fig = go.Figure()
             
         try:
-            weather_fig = px.line(weather_df.groupby(['Year', 'Event_Type'])['Count']
-                                .sum()
-                                .reset_index(),
-                                x='Year',
-                                y='Count',
-                                color='Event_Type',
-                                title='Extreme Weather Events Over Time')
-            print("Weather events figure created successfully")
+            with timer('dashboard_figure_build_seconds', figure='weather'):
+                weather_counts = data_store.registry.get('weather_by_year')
+                weather_fig = px.line(weather_counts.reset_index()
+                                    .melt(id_vars='Year', var_name='Event_Type', value_name='Count'),
+                                    x='Year',
+                                    y='Count',
+                                    color='Event_Type',
+                                    title='Extreme Weather Events Over Time')
         except Exception as e:
-            print(f"Error creating weather events figure: {e}")
+            logger.error("Error creating figure", extra={'fields': {'figure': 'weather', 'error': e}})
             weather_fig = go.Figure()
         
         # Dashboard layout
-        app.layout = dbc.Container([
+        return dbc.Container([
             dbc.Row([
                 dbc.Col([
                     html.H1("Climate Change Impact Dashboard",
@@ -187,23 +174,70 @@ try:
                 ])
             ])
         ], fluid=True)
-        print("Layout created successfully")
-except Exception as e:
-    print(f"Error creating layout: {e}")
-    traceback.print_exc()
-    sys.exit(1)
+
+def create_app():
+    """
+    Build the Dash app. Nothing is loaded at import time; the data and
+    figures are loaded according to CLIMATE_STARTUP (see startup.py): here,
+    so a WSGI server can call this once in the master process (gunicorn
+    "app:create_app().server" --preload) and fork the workers, on a
+    background thread, or on the first page load.
+    """
+    try:
+        app = dash.Dash(
+            __name__, 
+            external_stylesheets=[dbc.themes.BOOTSTRAP],
+            suppress_callback_exceptions=True
+        )
+        app.title = 'Climate Change Impact Dashboard'
+        register_metrics(app.server)
+        register_api(app.server)
+        register_compression(app.server)
+        logger.info("Dash app created")
+    except Exception as e:
+        logger.exception("Error creating Dash app")
+        sys.exit(1)
+
+    # Dash calls a function layout on each page load; it waits for the build
+    layout = warm_up(lambda: (data_store.dataset_version(), build_layout(*load_data())),
+                     'build layout')
+    if layout.mode == 'preload':
+        try:
+            layout.result()
+            logger.info("Layout created")
+        except Exception as e:
+            logger.exception("Error creating layout")
+            sys.exit(1)
+
+    latest = {}
+
+    def serve_layout():
+        # Rebuilt once the datasets change on disk (e.g. a refresh.py release)
+        version, content = latest.get('layout') or layout.result()
+        if version != data_store.dataset_version():
+            version = data_store.dataset_version()
+            content = build_layout(*load_data())
+            logger.info("Layout rebuilt for new data")
+        latest['layout'] = (version, content)
+        return content
+
+    app.layout = serve_layout
+    register_health(app.server, layout.ready)
+    return app
 
 def open_browser():
+    import webbrowser
     webbrowser.open_new('http://localhost:8501/')
 
 if __name__ == '__main__':
     try:
         port = 8501  # Using the same working port as the test app
-        print(f"\nStarting server on port {port}...")
-        print(f"Dashboard will be available at: http://localhost:{port}")
-        print("Press Ctrl+C to quit\n")
+        logger.info("Starting server", extra={'fields': {'url': f'http://localhost:{port}'}})
+        
+        app = create_app()
         
         # Open the browser after a short delay
+        from threading import Timer
         Timer(1.5, open_browser).start()
         
         # Run the server with minimal settings
@@ -214,9 +248,6 @@ if __name__ == '__main__':
             use_reloader=False  # Disable reloader
         )
     except Exception as e:
-        print(f"\nError starting server: {e}")
-        traceback.print_exc()
-        print("\nTroubleshooting steps:")
-        print(f"1. Make sure port {port} is not in use")
-        print("2. Check your firewall settings")
-        print("3. Make sure you have internet access for loading the Bootstrap theme") 
\ No newline at end of file
+        logger.exception("Error starting server. Make sure the port is not in use, check your "
+                         "firewall settings and that the Bootstrap theme can be downloaded",
+                         extra={'fields': {'port': port}}) 
\ No newline at end of file
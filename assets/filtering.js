@@ -0,0 +1,55 @@
+/*
+ * Clientside year-range and selection filtering for minimal_app.py
+ * (CLIMATE_FILTERING=client). The server sends each graph's base figure
+ * once, covering every selectable trace over the whole slider span; these
+ * functions cut it down in the browser on every slider or selector change.
+ */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    filtering: {
+        // Keep the points of each trace inside the year range. Traces with
+        // meta.show_from (forecasts) are shown whole once the range reaches
+        // that year and hidden otherwise.
+        yearRange: function(years, figure) {
+            if (!figure || !figure.data || !years) {
+                return {};
+            }
+            var data = figure.data.map(function(trace) {
+                if (trace.meta && trace.meta.show_from !== undefined) {
+                    return Object.assign({}, trace, {visible: years[1] >= trace.meta.show_from});
+                }
+                var x = [], y = [];
+                for (var i = 0; i < trace.x.length; i++) {
+                    var year = typeof trace.x[i] === 'string' ? parseFloat(trace.x[i]) : trace.x[i];
+                    if (year >= years[0] && year <= years[1]) {
+                        x.push(trace.x[i]);
+                        y.push(trace.y[i]);
+                    }
+                }
+                return Object.assign({}, trace, {x: x, y: y});
+            });
+
+            var layout = Object.assign({}, figure.layout);
+            ['xaxis', 'yaxis'].forEach(function(axis) {
+                layout[axis] = Object.assign({}, layout[axis], {range: null, autorange: true});
+            });
+            if (layout.title && layout.title.text) {
+                layout.title = Object.assign({}, layout.title, {
+                    text: layout.title.text.replace(/\(\d+-\d+\)$/, '(' + years[0] + '-' + years[1] + ')')
+                });
+            }
+            return {data: data, layout: layout};
+        },
+
+        // Traces of the selected names, in selection order, then yearRange
+        selectTraces: function(selected, years, figure) {
+            if (!selected || !selected.length || !figure || !figure.data) {
+                return {};
+            }
+            var data = selected.map(function(name) {
+                return figure.data.find(function(trace) { return trace.name === name; });
+            }).filter(Boolean);
+            return window.dash_clientside.filtering.yearRange(
+                years, Object.assign({}, figure, {data: data}));
+        }
+    }
+});
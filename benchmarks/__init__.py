@@ -0,0 +1,12 @@
+"""
+Benchmark suite for the data pipeline and the dashboard callbacks.
+
+Run from the repository root:
+
+    python -m benchmarks                      # everything, default scales
+    python -m benchmarks --suite callbacks --scales 1,10,100
+    python -m benchmarks --compare bench_results/<commit>.json
+
+Results are written as JSON under bench_results/, named after the current
+git commit, so runs can be compared across commits.
+"""
@@ -0,0 +1,59 @@
+import argparse
+import contextlib
+import io
+import json
+import logging
+import sys
+
+from . import bench_callbacks, bench_processing
+from .harness import compare_results, environment, format_results, save_results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Climate dashboard benchmarks')
+    parser.add_argument('--suite', choices=['all', 'processing', 'callbacks'], default='all')
+    parser.add_argument('--scales', default='1,10,100',
+                        help='comma-separated dataset scale factors for the callback suite')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--owid-countries', type=int, default=250,
+                        help='countries in the OWID fixture for the processing suite')
+    parser.add_argument('--output-dir', default='bench_results')
+    parser.add_argument('--compare', help='baseline result file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative slowdown reported as a regression')
+    parser.add_argument('--verbose', action='store_true', help='show application output')
+    args = parser.parse_args(argv)
+
+    # Read the baseline first: it may be the file this run is about to overwrite
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {'environment': environment(), 'suites': {}}
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    if not args.verbose:
+        logging.getLogger('climate').setLevel(logging.WARNING)
+    with output:
+        if args.suite in ('all', 'processing'):
+            results['suites']['processing'] = bench_processing.run(
+                repeat=max(1, args.repeat // 4), owid_countries=args.owid_countries)
+        if args.suite in ('all', 'callbacks'):
+            scales = tuple(int(scale) for scale in args.scales.split(','))
+            results['suites']['callbacks'] = bench_callbacks.run(scales=scales, repeat=args.repeat)
+
+    print(format_results(results))
+    print(f"\nResults written to {save_results(results, args.output_dir)}")
+
+    if baseline is not None:
+        lines, regressions = compare_results(results, baseline, args.threshold)
+        print('\n'.join(lines))
+        if regressions:
+            print(f"\n{regressions} regression(s) above {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
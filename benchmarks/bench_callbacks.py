@@ -0,0 +1,68 @@
+"""
+minimal_app callback latency over scaled synthetic datasets.
+
+Each callback is invoked directly, once with an empty figure cache (the
+cost of building a figure) and once with a warm cache (the common case
+for default views). The serialized size of the returned figure is
+recorded alongside latency and peak memory.
+"""
+import json
+import os
+import tempfile
+
+import data_store
+from figure_cache import figure_cache
+
+from .fixtures import write_scaled_datasets
+from .harness import measure
+
+
+def figure_only(callback):
+    """Callback returning (figure, trace state) reduced to its figure"""
+    return lambda *args: callback(*args)[0]
+
+
+def callback_cases(app_module, info):
+    """(name, callback, args) for each benchmarked callback"""
+    years = list(info['years'])
+    emissions = figure_only(app_module.update_emissions_graph)
+    weather = figure_only(app_module.update_weather_graph)
+    return [
+        ('temperature', app_module.update_temperature_graph, (years, 'linear', 30)),
+        # Zoomed to 15 years, which shows the monthly (scaled) table
+        ('temperature_monthly', app_module.update_temperature_graph,
+         (years, 'linear', 30, {'xaxis.range[0]': '2000-01-01', 'xaxis.range[1]': '2015-01-01'})),
+        ('emissions', emissions, (info['countries'][:5], [1950, 2024])),
+        ('emissions_all', emissions, (info['countries'][:50], [1900, 2024])),
+        ('weather', weather, (info['event_types'], [1990, 2024]))
+    ]
+
+
+def run(scales=(1, 10, 100), repeat=20):
+    import minimal_app
+
+    cases = {}
+    cwd = os.getcwd()
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            info = write_scaled_datasets(os.path.join(tmp, 'data'), scale)
+            os.chdir(tmp)
+            data_store.registry.clear()
+            try:
+                for name, callback, args in callback_cases(minimal_app, info):
+                    def uncached():
+                        figure_cache.clear()
+                        return callback(*args)
+
+                    stats, figure = measure(uncached, repeat)
+                    stats['figure_bytes'] = len(json.dumps(figure))
+                    stats['dataset_rows'] = info['rows']
+                    cases[f"{name}@{scale}x"] = stats
+
+                    stats, _ = measure(lambda: callback(*args), repeat)
+                    cases[f"{name}@{scale}x cached"] = stats
+            finally:
+                os.chdir(cwd)
+                data_store.registry.clear()
+                figure_cache.clear()
+    return cases
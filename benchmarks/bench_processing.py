@@ -0,0 +1,55 @@
+"""
+data_processor stage timings against a local stand-in for the GISS and
+OWID hosts serving upstream-shaped fixtures.
+"""
+import os
+import tempfile
+
+import data_processor
+from aggregates import build_weather_cubes
+from http_cache import HTTPCache
+
+from .fixtures import GISS_FILE, OWID_FILE, write_fixtures
+from .harness import StandInServer, measure
+
+
+def run(repeat=5, owid_countries=250):
+    cases = {}
+    cwd = os.getcwd()
+    original_urls = (data_processor.GISS_TEMPERATURE_URL, data_processor.OWID_CO2_URL)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        upstream = os.path.join(tmp, 'upstream')
+        write_fixtures(upstream, owid_countries=owid_countries)
+        work = os.path.join(tmp, 'work')
+        os.makedirs(os.path.join(work, 'data'))
+        os.chdir(work)
+        try:
+            with StandInServer(upstream) as server:
+                data_processor.GISS_TEMPERATURE_URL = server.url(GISS_FILE)
+                data_processor.OWID_CO2_URL = server.url(OWID_FILE)
+
+                cases['fetch_temperature_data'], _ = measure(
+                    data_processor.fetch_temperature_data, repeat)
+                cases['fetch_co2_emissions'], emissions = measure(
+                    data_processor.fetch_co2_emissions, repeat)
+                cases['create_geographic_data'], _ = measure(
+                    lambda: data_processor.create_geographic_data(emissions_df=emissions), repeat)
+
+                weather = data_processor.fetch_weather_events(rng=0)
+                cases['build_weather_cubes'], _ = measure(
+                    lambda: build_weather_cubes(weather), repeat)
+
+                # Full refresh with an empty HTTP cache, then with a primed one (304s)
+                runs = iter(range(repeat + 2))
+                cases['process_and_save_data_cold'], _ = measure(
+                    lambda: data_processor.process_and_save_data(
+                        cache=HTTPCache(os.path.join(tmp, f"cache-{next(runs)}")), force=True),
+                    repeat)
+                warm_cache = HTTPCache(os.path.join(tmp, 'cache-warm'))
+                cases['process_and_save_data_warm'], _ = measure(
+                    lambda: data_processor.process_and_save_data(cache=warm_cache), repeat)
+        finally:
+            data_processor.GISS_TEMPERATURE_URL, data_processor.OWID_CO2_URL = original_urls
+            os.chdir(cwd)
+    return cases
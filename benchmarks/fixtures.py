@@ -0,0 +1,134 @@
+"""
+Upstream-shaped fixtures for the benchmarks.
+
+The files mimic the layouts of the NASA GISS GLB.Ts+dSST.csv table and the
+OWID owid-co2-data.csv export (including columns and aggregate rows that
+the pipeline has to skip), generated deterministically from the synthetic
+engine so that no network access is needed.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import synthetic
+from aggregates import period_dates
+from data_store import DATASET_FILES
+
+GISS_FILE = 'GLB.Ts+dSST.csv'
+OWID_FILE = 'owid-co2-data.csv'
+
+GISS_MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+GISS_SEASONS = ['DJF', 'MAM', 'JJA', 'SON']
+
+# Extra OWID columns that the streaming parser must skip
+OWID_EXTRA_COLUMNS = ['cement_co2', 'coal_co2', 'flaring_co2', 'gas_co2', 'gdp',
+                      'methane', 'nitrous_oxide', 'oil_co2', 'share_global_co2',
+                      'total_ghg', 'trade_co2']
+
+
+def _iso_code(index):
+    """Three-letter placeholder ISO code: AAA, AAB, ..."""
+    return ''.join(chr(65 + (index // 26 ** power) % 26) for power in (2, 1, 0))
+
+
+def write_giss_fixture(path, first_year=1880, last_year=2024, seed=0):
+    """GISS-style table: a title line, monthly anomalies, J-D, D-N and seasons"""
+    rng = np.random.default_rng(seed)
+    years = np.arange(first_year, last_year + 1)
+    trend = (years - 1950) * 0.01
+    monthly = np.round(trend[:, None] + rng.normal(0, 0.15, (len(years), 12)), 2)
+
+    table = pd.DataFrame(monthly, columns=GISS_MONTHS)
+    table.insert(0, 'Year', years)
+    table['J-D'] = monthly.mean(axis=1).round(2)
+    table['D-N'] = table['J-D']
+    for season, months in zip(GISS_SEASONS, ([11, 0, 1], [2, 3, 4], [5, 6, 7], [8, 9, 10])):
+        table[season] = monthly[:, months].mean(axis=1).round(2)
+
+    # The current year is incomplete upstream
+    table = table.astype(object)
+    table.iloc[-1, 7:] = '***'
+
+    with open(path, 'w') as f:
+        f.write("Land-Ocean: Global Means\n")
+        table.to_csv(f, index=False)
+
+
+def write_owid_fixture(path, countries=250, first_year=1750, last_year=2022, seed=0):
+    """OWID-style CO2 export with aggregate rows and unused columns"""
+    rng = np.random.default_rng(seed)
+    names = synthetic.synthetic_names('Country', countries)
+    years = np.arange(first_year, last_year + 1)
+
+    df = synthetic.emissions_panel(names + ['World', 'Asia'], years, rng=rng)
+    df['country'] = df['country'].astype(str)
+    iso_codes = [_iso_code(i) for i in range(countries)] + ['OWID_WRL', '']
+    df['iso_code'] = np.repeat(iso_codes, len(years))
+    for column in OWID_EXTRA_COLUMNS:
+        df[column] = np.round(rng.random(len(df)) * 100, 3)
+
+    columns = ['country', 'year', 'iso_code', 'population'] + OWID_EXTRA_COLUMNS[:5] + \
+        ['co2', 'co2_per_capita'] + OWID_EXTRA_COLUMNS[5:]
+    df[columns].to_csv(path, index=False, float_format='%.3f')
+
+
+def write_fixtures(directory, owid_countries=250):
+    """Write both upstream fixtures into directory and return their paths"""
+    os.makedirs(directory, exist_ok=True)
+    giss_path = os.path.join(directory, GISS_FILE)
+    owid_path = os.path.join(directory, OWID_FILE)
+    write_giss_fixture(giss_path)
+    write_owid_fixture(owid_path, countries=owid_countries)
+    return giss_path, owid_path
+
+
+def dense_monthly(monthly, samples, rng):
+    """
+    A monthly temperature table with `samples` readings per month, spread
+    evenly over its first 28 days, so a larger table still covers the
+    same years
+    """
+    if samples == 1:
+        return monthly
+    dense = monthly.loc[monthly.index.repeat(samples)].reset_index(drop=True)
+    step = np.tile(np.arange(samples), len(monthly))
+    dense['Date'] = period_dates(dense['Year'], dense['Month']) + \
+        (step * (28 * 86400 // samples)).astype('timedelta64[s]')
+    dense['Temperature'] += rng.normal(0, 0.1, size=len(dense))
+    return dense
+
+
+def write_scaled_datasets(data_dir, scale, seed=0):
+    """
+    Processed datasets at `scale` times the size of the shipped data:
+    more countries, more event types and more temperature readings per
+    month, all within the real 1900-2023 record
+    """
+    import data_processor
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(data_dir, exist_ok=True)
+
+    temperature_years = np.arange(1900, 2024)
+    temperature = data_processor.temperature_resolutions(
+        synthetic.monthly_temperatures(temperature_years, rng=rng))
+    temperature['temperature_monthly'] = dense_monthly(temperature['temperature_monthly'],
+                                                       scale, rng)
+
+    countries = synthetic.synthetic_names('Country', 8 * scale)
+    emissions = synthetic.emissions_panel(countries, np.arange(1900, 2024), rng=rng)
+
+    event_types = synthetic.synthetic_names('Event', 4 * scale)
+    weather = synthetic.weather_events(event_types, np.arange(1990, 2024), rng=rng)
+
+    tables = {**temperature, 'emissions': emissions, 'weather': weather}
+    for name, df in tables.items():
+        df.to_csv(os.path.join(data_dir, DATASET_FILES[name]), index=False)
+    return {
+        'countries': countries,
+        'event_types': event_types,
+        'years': (int(temperature_years[0]), int(temperature_years[-1])),
+        'rows': sum(len(df) for df in tables.values())
+    }
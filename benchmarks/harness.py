@@ -0,0 +1,138 @@
+"""
+Timing, memory and reporting helpers shared by the benchmark suites.
+"""
+import functools
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+import tracemalloc
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+def measure(func, repeat=20, warmup=1):
+    """
+    Run func repeatedly and return latency percentiles (ms). Peak traced
+    memory is measured on one extra run, so tracing does not skew timings.
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    samples = np.array(samples)
+    return {
+        'repeat': repeat,
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'max_ms': float(samples.max()),
+        'peak_mem_mb': peak / 1e6
+    }, result
+
+
+class StandInServer:
+    """Threaded local HTTP server standing in for the upstream data hosts"""
+
+    def __init__(self, directory, port=0):
+        handler = functools.partial(_QuietHandler, directory=directory)
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, filename):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}/{filename}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def environment():
+    """Commit and interpreter details stored with every result file"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = 'unknown', False
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+def save_results(results, directory='bench_results'):
+    os.makedirs(directory, exist_ok=True)
+    name = results['environment']['commit'] + ('-dirty' if results['environment']['dirty'] else '')
+    path = os.path.join(directory, f"{name}.json")
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return path
+
+
+def format_results(results):
+    lines = []
+    for suite, cases in results['suites'].items():
+        lines.append(f"\n{suite}")
+        lines.append(f"  {'case':<40} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+                     f"{'peak MB':>9} {'bytes':>10}")
+        for case, stats in cases.items():
+            lines.append(f"  {case:<40} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} "
+                         f"{stats['p99_ms']:9.2f} {stats['peak_mem_mb']:9.2f} "
+                         f"{stats.get('figure_bytes', ''):>10}")
+    return '\n'.join(lines)
+
+
+def compare_results(current, baseline, threshold=0.10):
+    """
+    Compare p50 latency and peak memory against a baseline result file.
+    Returns (report lines, number of regressions above threshold).
+    """
+    lines = [f"\nCompared with {baseline['environment']['commit']}:"]
+    regressions = 0
+    for suite, cases in current['suites'].items():
+        for case, stats in cases.items():
+            before = baseline['suites'].get(suite, {}).get(case)
+            if not before:
+                continue
+            for metric in ('p50_ms', 'peak_mem_mb', 'figure_bytes'):
+                if metric not in stats or not before.get(metric):
+                    continue
+                change = stats[metric] / before[metric] - 1
+                flag = ''
+                if change > threshold:
+                    flag = '  REGRESSION'
+                    regressions += 1
+                lines.append(f"  {suite}/{case} {metric}: {before[metric]:.2f} -> "
+                             f"{stats[metric]:.2f} ({change:+.1%}){flag}")
+    return lines, regressions
@@ -1,14 +1,19 @@
-print("Starting callback application...")
-
 import dash
 from dash import html, dcc
 from dash.dependencies import Input, Output
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+import data_store
+from instrumentation import configure_logging, get_logger, instrument_callback, register_metrics
+
+configure_logging()
+logger = get_logger('callback_app')
+logger.info("Starting callback application")
+
 # Initialize the app
 app = dash.Dash(__name__)
+register_metrics(app.server)
 
 # Define the layout first
 app.layout = html.Div([
@@ -40,9 +45,9 @@ app.layout = html.Div([
     Output('temperature-graph', 'figure'),
     Input('trigger', 'children')
 )
+@instrument_callback('update_temperature_graph')
 def update_temperature_graph(_):
-    print("Loading temperature data...")
-    df = pd.read_csv('data/temperature_data.csv')
+    df = data_store.registry.get('temperature')
     fig = px.line(df, x='Year', y='Temperature', color='Type',
                   title='Global Temperature Trends')
     return fig
@@ -51,17 +56,17 @@ def update_temperature_graph(_):
     Output('emissions-graph', 'figure'),
     Input('trigger', 'children')
 )
+@instrument_callback('update_emissions_graph')
 def update_emissions_graph(_):
-    print("Loading emissions data...")
-    df = pd.read_csv('data/emissions_data.csv')
+    series = data_store.registry.series('emissions')
     
     fig = go.Figure()
-    for country in ['United States', 'China', 'India', 'Russian Federation', 'Japan']:
-        country_data = df[df['country'] == country]
+    for country in ['United States', 'China', 'India', 'Russia', 'Japan']:
+        years, co2 = series.get(country, 'co2')
         fig.add_trace(
             go.Scatter(
-                x=country_data['year'],
-                y=country_data['co2'],
+                x=years,
+                y=co2,
                 name=country,
                 mode='lines+markers'
             )
@@ -79,17 +84,17 @@ def update_emissions_graph(_):
     Output('weather-graph', 'figure'),
     Input('trigger', 'children')
 )
+@instrument_callback('update_weather_graph')
 def update_weather_graph(_):
-    print("Loading weather data...")
-    df = pd.read_csv('data/weather_events.csv')
+    series = data_store.registry.series('weather')
     
     fig = go.Figure()
-    for event in df['Event_Type'].unique():
-        event_data = df[df['Event_Type'] == event]
+    for event in series.keys:
+        years, counts = series.get(event, 'Count')
         fig.add_trace(
             go.Scatter(
-                x=event_data['Year'],
-                y=event_data['Count'],
+                x=years,
+                y=counts,
                 name=event,
                 mode='lines+markers'
             )
@@ -104,8 +109,7 @@ def update_weather_graph(_):
     return fig
 
 if __name__ == '__main__':
-    print("\nStarting server on port 8502...")  # Using a different port
-    print("Dashboard will be available at: http://localhost:8502")
-    print("Press Ctrl+C to quit\n")
+    # Using a different port
+    logger.info("Starting server", extra={'fields': {'url': 'http://localhost:8502'}})
     
     app.run_server(debug=True, port=8502, host='localhost') 
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""
+Response compression for the Flask server underneath the Dash apps.
+
+Callback responses (figures and store payloads) and the Dash JS bundles
+are JSON and JavaScript, which brotli and gzip shrink several-fold.
+flask-compress negotiates the encoding from Accept-Encoding, preferring
+the first of CLIMATE_COMPRESSION (default "br,gzip"; "none" disables it).
+Without flask-compress installed responses are sent uncompressed.
+"""
+import os
+
+from instrumentation import get_logger
+
+logger = get_logger('compression')
+
+COMPRESSION_ALGORITHMS = [a.strip() for a in os.environ.get('CLIMATE_COMPRESSION', 'br,gzip').split(',')
+                          if a.strip() and a.strip() != 'none']
+
+COMPRESSED_MIMETYPES = ['application/json', 'application/javascript', 'text/javascript',
+                        'text/html', 'text/css', 'text/plain']
+
+
+def register_compression(server, algorithms=None, min_size=500, br_level=5, gzip_level=6):
+    """
+    Compress responses of a Flask server. Register it after
+    instrumentation.register_metrics so that the recorded response sizes
+    are the compressed (on the wire) ones. Levels favour speed: responses
+    are compressed per request, not ahead of time.
+    """
+    algorithms = COMPRESSION_ALGORITHMS if algorithms is None else algorithms
+    if not algorithms:
+        return server
+    try:
+        from flask_compress import Compress
+    except ImportError:
+        logger.warning("flask-compress is not installed, responses are not compressed")
+        return server
+
+    server.config.update(
+        COMPRESS_ALGORITHM=list(algorithms),
+        COMPRESS_MIMETYPES=COMPRESSED_MIMETYPES,
+        COMPRESS_MIN_SIZE=min_size,
+        COMPRESS_BR_LEVEL=br_level,
+        COMPRESS_LEVEL=gzip_level
+    )
+    Compress(server)
+    return server
@@ -1,248 +1,427 @@
 import pandas as pd
-import requests
 import io
 import os
 import numpy as np
-from sklearn.linear_model import LinearRegression
 from datetime import datetime, timedelta
+import threading
 import time
 
-def fetch_with_retry(url, max_retries=3):
-    """Helper function to fetch data with retries"""
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            return response
-        except requests.exceptions.RequestException as e:
-            if attempt == max_retries - 1:
-                print(f"Failed to fetch data from {url} after {max_retries} attempts: {e}")
-                return None
-            print(f"Attempt {attempt + 1} failed, retrying...")
-            time.sleep(2 ** attempt)  # Exponential backoff
-
-def generate_sample_temperature_data():
-    """Generate sample temperature data if API fails"""
-    print("Generating sample temperature data...")
-    years = list(range(1900, 2024))
-    temperatures = [15 + year * 0.01 + np.random.normal(0, 0.5) for year in years]
-    
-    df = pd.DataFrame({
-        'Year': years,
-        'Temperature': temperatures,
-        'Type': 'Historical'
-    })
-    
-    # Generate predictions
-    X = df['Year'].values.reshape(-1, 1)
-    y = df['Temperature'].values
-    model = LinearRegression()
-    model.fit(X, y)
-    
-    future_years = np.array(range(2024, 2054))
-    predictions = model.predict(future_years.reshape(-1, 1))
-    
-    prediction_df = pd.DataFrame({
-        'Year': future_years,
-        'Temperature': predictions,
-        'Type': 'Prediction'
-    })
+import database
+import forecasting
+import resilience
+import synthetic
+from aggregates import (TEMPERATURE_RESOLUTIONS, WEATHER_CUBES, build_temperature_resolutions,
+                        build_weather_cubes)
+from data_store import (DATA_DIR, DATASET_FILES, DISPLAY_PRECISION, columnar_path, read_dataset,
+                        round_floats, write_columnar)
+from http_cache import HTTPCache
+from instrumentation import get_logger, metrics
+from pipeline import Stage, run_pipeline
+from resilience import Deadline, UpstreamError
+
+GISS_TEMPERATURE_URL = "https://data.giss.nasa.gov/gistemp/tabledata_v4/GLB.Ts+dSST.csv"
+OWID_CO2_URL = "https://raw.githubusercontent.com/owid/co2-data/master/owid-co2-data.csv"
+
+# Columns kept from the OWID CO2 dataset and their parse dtypes
+OWID_COLUMNS = ['country', 'iso_code', 'year', 'co2', 'co2_per_capita', 'population']
+OWID_DTYPES = {'country': 'object', 'iso_code': 'object', 'year': 'int32', 'co2': 'float64',
+               'co2_per_capita': 'float64', 'population': 'float64'}
+
+# Countries kept from the OWID data, e.g. CLIMATE_COUNTRIES="China,India".
+# None keeps every country (rows with an ISO code that is not an OWID aggregate).
+COUNTRIES = [c.strip() for c in os.environ['CLIMATE_COUNTRIES'].split(',')] \
+    if os.environ.get('CLIMATE_COUNTRIES') else None
+
+# Bundled ISO code -> centroid lookup used for the map
+COUNTRY_CENTROIDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                      'data', 'country_centroids.csv')
+
+# Output formats written by process_and_save_data. CSV is kept as the
+# fallback; 'feather' adds a memory-mappable columnar copy.
+OUTPUT_FORMATS = tuple(os.environ.get('CLIMATE_DATA_FORMATS', 'csv,feather').split(','))
+
+logger = get_logger('data_processor')
+
+metrics.describe('dashboard_dataset_fallback_total', 'counter',
+                 'Datasets whose source failed, by outcome (last_known_good, unavailable)')
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Shared requests.Session with a connection pool sized for concurrent fetches"""
+    global _session
+    # requests is only needed when refreshing from upstream, not to import
+    # this module for its helpers
+    import requests
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+    return _session
+
+def _retryable(error):
+    """Connection errors, timeouts, 429 and 5xx answers are worth retrying; other 4xx are not"""
+    import requests
+    response = getattr(error, 'response', None)
+    if isinstance(error, requests.exceptions.HTTPError) and response is not None:
+        return response.status_code == 429 or response.status_code >= 500
+    return isinstance(error, requests.exceptions.RequestException)
+
+def fetch_with_retry(url, max_retries=resilience.RETRY_ATTEMPTS, cache=None, stream=False,
+                     deadline=None):
+    """
+    Fetch a URL under the resilience retry policy: jittered backoff, the
+    refresh deadline and the host's circuit breaker. Raises UpstreamError
+    when the fetch does not succeed.
+    With an HTTPCache, a conditional GET is issued and the cached body is
+    returned (with response.not_modified set) when the server answers 304.
+    With stream=True the body is not read into memory; use open_body() to
+    consume it.
+    """
+    def attempt(timeout):
+        headers = cache.conditional_headers(url) if cache else {}
+        response = get_session().get(url, timeout=timeout, headers=headers, stream=stream)
+        if response.status_code == 304 and cache:
+            cached = cache.cached_response(url)
+            if cached is not None:
+                logger.info("Upstream not modified, using cached copy",
+                            extra={'fields': {'url': url}})
+                return cached
+            # Validators without a body: fetch again unconditionally
+            response = get_session().get(url, timeout=timeout, stream=stream)
+        response.raise_for_status()
+        if stream and cache:
+            return cache.store_stream(url, response)
+        response.from_cache = False
+        response.not_modified = False
+        if cache:
+            cache.store(url, response)
+        return response
+
+    return resilience.call(attempt, url, deadline, max_retries, _retryable)
+
+def open_body(response):
+    """Binary file object over a response body, streamed when possible"""
+    if hasattr(response, 'open'):
+        return response.open()
+    if response.raw is not None and not response._content_consumed:
+        response.raw.decode_content = True
+        return response.raw
+    return io.BytesIO(response.content)
+
+WEATHER_EVENT_TYPES = ['Hurricane', 'Flood', 'Drought', 'Extreme Temperature']
+
+# Seed of the demo weather events, so every run produces the same numbers
+WEATHER_SEED = 1990
+
+def temperature_resolutions(giss_df):
+    """
+    Temperature datasets from a GISS-style monthly table: the monthly,
+    seasonal and decadal tables and the annual series with its predictions,
+    keyed by dataset name
+    """
+    tables = build_temperature_resolutions(giss_df)
     
-    return pd.concat([df, prediction_df])
+    # Add temperature predictions for the next 30 years
+    yearly_avg = tables['temperature']
+    prediction_df = forecasting.forecast(yearly_avg['Year'], yearly_avg['Temperature'],
+                                         kind='linear')
+    yearly_avg['Type'] = 'Historical'
+    tables['temperature'] = pd.concat([yearly_avg, prediction_df], ignore_index=True)
+    return tables
 
-def fetch_temperature_data():
+def fetch_temperature_data(url=None, cache=None, skip_unchanged=False, deadline=None):
     """
-    Fetch global temperature data from NASA GISS
-    Returns processed DataFrame
+    Fetch global temperature data from NASA GISS (GISS_TEMPERATURE_URL by default)
+    Returns the processed tables keyed by dataset name (see
+    temperature_resolutions), or None if skip_unchanged is set and the
+    upstream file has not changed since the cached copy. Raises
+    UpstreamError when the data cannot be fetched or parsed.
     """
+    url = url or GISS_TEMPERATURE_URL
+    response = fetch_with_retry(url, cache=cache, deadline=deadline)
+    if skip_unchanged and response.not_modified:
+        logger.info("Upstream unchanged, skipping processing",
+                    extra={'fields': {'dataset': 'temperature'}})
+        return None
+    
     try:
-        url = "https://data.giss.nasa.gov/gistemp/tabledata_v4/GLB.Ts+dSST.csv"
-        response = fetch_with_retry(url)
-        
-        if response is None:
-            return generate_sample_temperature_data()
-            
         df = pd.read_csv(io.StringIO(response.text), skiprows=1)
         
-        # Process the data
-        df = df.melt(id_vars=['Year'], var_name='Month', value_name='Temperature')
-        df = df[df['Month'] != 'J-D']  # Remove annual average
-        df['Temperature'] = pd.to_numeric(df['Temperature'], errors='coerce')
-        
-        # Add temperature predictions
-        yearly_avg = df.groupby('Year')['Temperature'].mean().reset_index()
-        X = yearly_avg['Year'].values.reshape(-1, 1)
-        y = yearly_avg['Temperature'].values
-        
-        model = LinearRegression()
-        model.fit(X, y)
-        
-        # Predict next 30 years
-        future_years = np.array(range(X[-1][0] + 1, X[-1][0] + 31)).reshape(-1, 1)
-        predictions = model.predict(future_years)
-        
-        prediction_df = pd.DataFrame({
-            'Year': future_years.flatten(),
-            'Temperature': predictions,
-            'Type': 'Prediction'
-        })
-        yearly_avg['Type'] = 'Historical'
-        
-        final_df = pd.concat([yearly_avg, prediction_df])
-        return final_df
+        # Only the month columns are used; J-D, D-N and the seasonal
+        # columns are recomputed from them
+        return temperature_resolutions(df)
     except Exception as e:
-        print(f"Error processing temperature data: {e}")
-        return generate_sample_temperature_data()
-
-def generate_sample_emissions_data():
-    """Generate sample emissions data if API fails"""
-    print("Generating sample emissions data...")
-    years = range(1900, 2024)
-    countries = ['United States', 'China', 'India', 'Russian Federation', 
-                'Japan', 'Germany', 'United Kingdom', 'Canada']
-    
-    data = []
-    for country in countries:
-        base_emissions = np.random.uniform(100, 1000)
-        growth_rate = np.random.uniform(1.01, 1.03)
-        population_base = np.random.uniform(10e6, 500e6)
-        
-        for year in years:
-            emissions = base_emissions * (growth_rate ** (year - 1900))
-            population = population_base * (1.01 ** (year - 1900))
-            data.append({
-                'country': country,
-                'year': year,
-                'co2': emissions,
-                'population': population,
-                'co2_per_capita': emissions / population * 1e6
-            })
+        raise UpstreamError(f"Could not process temperature data from {url}: {e}") from e
+
+def read_owid_co2(stream, countries=None, min_year=1900, chunksize=20000):
+    """
+    Parse the OWID CO2 CSV from a binary stream in chunks, keeping only
+    OWID_COLUMNS and filtering countries and years chunk by chunk so peak
+    memory does not depend on the size of the upstream file.
+    countries=None keeps all countries and drops regional aggregates.
+    """
+    frames = []
+    reader = pd.read_csv(stream, usecols=OWID_COLUMNS, dtype=OWID_DTYPES,
+                         chunksize=chunksize)
+    for chunk in reader:
+        if countries is None:
+            iso_code = chunk['iso_code']
+            in_universe = iso_code.notna() & (~iso_code.str.startswith('OWID_', na=False)
+                                              | (iso_code == 'OWID_KOS'))
+        else:
+            in_universe = chunk['country'].isin(countries)
+        chunk = chunk[in_universe & (chunk['year'] >= min_year)]
+        if not chunk.empty:
+            frames.append(chunk)
     
-    return pd.DataFrame(data)
+    if not frames:
+        return pd.DataFrame({column: pd.Series(dtype=dtype)
+                             for column, dtype in OWID_DTYPES.items()})
+    return pd.concat(frames, ignore_index=True)[OWID_COLUMNS]
 
-def fetch_co2_emissions():
+def fetch_co2_emissions(url=None, cache=None, skip_unchanged=False, countries=COUNTRIES,
+                        deadline=None):
     """
-    Fetch CO2 emissions data from Our World in Data
-    Returns processed DataFrame
+    Fetch CO2 emissions data from Our World in Data (OWID_CO2_URL by default)
+    Returns processed DataFrame, or None if skip_unchanged is set and the
+    upstream file has not changed since the cached copy. Raises
+    UpstreamError when the data cannot be fetched or parsed.
     """
+    url = url or OWID_CO2_URL
+    response = fetch_with_retry(url, cache=cache, stream=True, deadline=deadline)
+    if skip_unchanged and response.not_modified:
+        logger.info("Upstream unchanged, skipping processing",
+                    extra={'fields': {'dataset': 'emissions'}})
+        return None
+    
     try:
-        url = "https://raw.githubusercontent.com/owid/co2-data/master/owid-co2-data.csv"
-        response = fetch_with_retry(url)
-        
-        if response is None:
-            return generate_sample_emissions_data()
-            
-        df = pd.read_csv(io.StringIO(response.text))
-        
-        # Select relevant columns and filter for major countries
-        columns = ['country', 'year', 'co2', 'co2_per_capita', 'population']
-        major_countries = ['United States', 'China', 'India', 'Russian Federation', 
-                         'Japan', 'Germany', 'United Kingdom', 'Canada']
-        
-        df = df[df['country'].isin(major_countries)][columns]
-        df = df[df['year'] >= 1900]
-        
-        return df
+        # Select relevant columns and filter countries while streaming
+        with open_body(response) as stream:
+            df = read_owid_co2(stream, countries)
     except Exception as e:
-        print(f"Error processing CO2 emissions data: {e}")
-        return generate_sample_emissions_data()
+        raise UpstreamError(f"Could not process CO2 emissions data from {url}: {e}") from e
+    if df.empty:
+        raise UpstreamError(f"No CO2 emissions rows in {url}")
+    return df
 
-def fetch_weather_events():
+def fetch_weather_events(rng=WEATHER_SEED):
     """
     Fetch extreme weather events data from NOAA
     Returns processed DataFrame
     """
     try:
         # For demo purposes, we'll generate sample weather events data
-        # In a real application, you would fetch this from NOAA's API
-        years = range(1990, 2024)
-        events = []
-        event_types = ['Hurricane', 'Flood', 'Drought', 'Extreme Temperature']
-        
-        for year in years:
-            for event_type in event_types:
-                # Generate increasing trend in events
-                base_events = 10 + (year - 1990) * 0.5
-                num_events = int(np.random.normal(base_events, 2))
-                events.append({
-                    'Year': year,
-                    'Event_Type': event_type,
-                    'Count': max(0, num_events)
-                })
-        
-        return pd.DataFrame(events)
-    except Exception as e:
-        print(f"Error generating weather events data: {e}")
+        # with an increasing trend. In a real application, you would fetch
+        # this from NOAA's API
+        return synthetic.weather_events(WEATHER_EVENT_TYPES, np.arange(1990, 2024), rng=rng)
+    except Exception:
+        logger.exception("Could not generate weather events data")
         return None
 
-def create_geographic_data():
+def load_country_centroids(path=COUNTRY_CENTROIDS_FILE):
     """
-    Create geographic data for emissions visualization
+    Load the bundled country centroid table (country, iso_code, lat, lon)
+    """
+    return pd.read_csv(path, keep_default_na=False, na_values=[''])
+
+def create_geographic_data(emissions_df=None, cache=None, skip_unchanged=False):
+    """
+    Create geographic data for emissions visualization.
+    Reuses emissions_df when given instead of fetching the OWID data again.
     """
     try:
-        emissions_df = fetch_co2_emissions()
+        if emissions_df is None:
+            emissions_df = fetch_co2_emissions(cache=cache, skip_unchanged=skip_unchanged)
         if emissions_df is None:
             return None
             
-        # Get the most recent year's data
-        latest_year = emissions_df['year'].max()
-        latest_data = emissions_df[emissions_df['year'] == latest_year]
-        
-        # Add latitude and longitude for each country (simplified)
-        country_coords = {
-            'United States': {'lat': 37.0902, 'lon': -95.7129},
-            'China': {'lat': 35.8617, 'lon': 104.1954},
-            'India': {'lat': 20.5937, 'lon': 78.9629},
-            'Russian Federation': {'lat': 61.5240, 'lon': 105.3188},
-            'Japan': {'lat': 36.2048, 'lon': 138.2529},
-            'Germany': {'lat': 51.1657, 'lon': 10.4515},
-            'United Kingdom': {'lat': 55.3781, 'lon': -3.4360},
-            'Canada': {'lat': 56.1304, 'lon': -106.3468}
-        }
+        # Latest year with data for each country
+        latest_data = emissions_df.dropna(subset=['co2']).reset_index(drop=True)
+        latest_data = latest_data.loc[latest_data.groupby('country', observed=True)['year'].idxmax()]
         
-        geo_data = []
-        for _, row in latest_data.iterrows():
-            country_data = country_coords.get(row['country'])
-            if country_data:
-                geo_data.append({
-                    'country': row['country'],
-                    'co2': row['co2'],
-                    'lat': country_data['lat'],
-                    'lon': country_data['lon']
-                })
+        # Join on ISO code when available, otherwise on the country name
+        centroids = load_country_centroids()
+        if 'iso_code' in latest_data.columns:
+            geo_df = latest_data.merge(centroids.drop(columns='country'), on='iso_code', how='inner')
+        else:
+            geo_df = latest_data.merge(centroids, on='country', how='inner')
         
-        return pd.DataFrame(geo_data)
-    except Exception as e:
-        print(f"Error creating geographic data: {e}")
+        return geo_df[['country', 'iso_code', 'year', 'co2', 'lat', 'lon']] \
+            .sort_values('country').reset_index(drop=True)
+    except Exception:
+        logger.exception("Could not create geographic data")
         return None
 
-def process_and_save_data():
+def save_dataset(df, name, data_dir=DATA_DIR, formats=OUTPUT_FORMATS, precision=DISPLAY_PRECISION):
+    """
+    Save a processed dataset in each of the requested formats, with float
+    values rounded to the display precision
+    """
+    path = os.path.join(data_dir, DATASET_FILES[name])
+    if precision is not None:
+        df = round_floats(df, precision)
+    if 'csv' in formats:
+        # Renamed into place so a running app never reads a half-written file
+        df.to_csv(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+    # Written last so the columnar copy is never older than the CSV
+    if 'feather' in formats:
+        write_columnar(df, path, name)
+
+def save_database(data_dir=DATA_DIR, owid_path=None):
+    """
+    Load the processed datasets in data_dir, and the full OWID export at
+    owid_path when given, into the embedded database. Skipped when the
+    database is already newer than all of its sources.
+    """
+    path = os.path.join(data_dir, database.DATABASE_FILE)
+    tables = {}
+    sources = [owid_path] if owid_path else []
+    for name, filename in DATASET_FILES.items():
+        dataset_path = os.path.join(data_dir, filename)
+        existing = [p for p in (dataset_path, columnar_path(dataset_path)) if os.path.exists(p)]
+        if existing:
+            tables[name] = dataset_path
+            sources.extend(existing)
+    
+    if os.path.exists(path) and all(os.path.getmtime(path) >= os.path.getmtime(source)
+                                    for source in sources):
+        logger.info("Database up to date, skipping", extra={'fields': {'path': path}})
+        return path
+    return database.write_database(
+        path, {name: read_dataset(dataset_path, name) for name, dataset_path in tables.items()},
+        owid_path)
+
+def _has_output(name, data_dir=DATA_DIR):
+    path = os.path.join(data_dir, DATASET_FILES[name])
+    return os.path.exists(path) or os.path.exists(columnar_path(path))
+
+def keep_last_known_good(name, error, data_dir=DATA_DIR):
+    """
+    Keep the saved dataset from the last successful run after its source
+    failed with error. Re-raises the error when there is none to keep.
+    """
+    if not _has_output(name, data_dir):
+        metrics.inc('dashboard_dataset_fallback_total', dataset=name, outcome='unavailable')
+        raise error
+    logger.warning("Source failed, keeping the last processed dataset",
+                   extra={'fields': {'dataset': name, 'error': str(error)}})
+    metrics.inc('dashboard_dataset_fallback_total', dataset=name, outcome='last_known_good')
+
+def _output_is_current(name, cache, url, data_dir=DATA_DIR):
+    """
+    True when the saved dataset is newer than the cached upstream body,
+    i.e. the last download was fully processed
+    """
+    output_path = os.path.join(data_dir, DATASET_FILES[name])
+    body_path = cache.body_path(url)
+    if not (os.path.exists(output_path) and os.path.exists(body_path)):
+        return False
+    return os.path.getmtime(output_path) >= os.path.getmtime(body_path)
+
+def process_and_save_data(formats=OUTPUT_FORMATS, force=False, cache=None, max_workers=4,
+                          data_dir=DATA_DIR, with_database=None, deadline=None):
     """
-    Process and save all data to CSV files
+    Process and save all data to CSV and columnar files in data_dir.
+    Independent sources are fetched concurrently and the emissions frame is
+    shared with the geographic step. Upstream downloads go through an
+    on-disk HTTP cache; datasets whose upstream file is unchanged keep their
+    existing output unless force is set. With with_database (by default
+    when CLIMATE_DATABASE is set) the results are also loaded into the
+    embedded database, see database.py.
+    All downloads share deadline (a resilience.Deadline, REFRESH_DEADLINE
+    seconds from now by default). A source that cannot be fetched keeps the
+    dataset of the last successful run; without one, UpstreamError is raised.
+    Returns the wall time of each stage in seconds.
     """
     # Create data directory if it doesn't exist
-    if not os.path.exists('data'):
-        os.makedirs('data')
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+    if cache is None:
+        cache = HTTPCache()
+    if deadline is None:
+        deadline = Deadline()
     
-    # Process temperature data
-    temp_df = fetch_temperature_data()
-    if temp_df is not None:
-        temp_df.to_csv('data/temperature_data.csv', index=False)
+    def temperature():
+        # Every resolution comes from the same download, so all must be current
+        unchanged = all(_output_is_current(name, cache, GISS_TEMPERATURE_URL, data_dir)
+                        for name in TEMPERATURE_RESOLUTIONS.values())
+        try:
+            tables = fetch_temperature_data(cache=cache, skip_unchanged=not force and unchanged,
+                                            deadline=deadline)
+        except UpstreamError as e:
+            keep_last_known_good('temperature', e, data_dir)
+            return None
+        if tables is None:
+            return None
+        for name, df in tables.items():
+            save_dataset(df, name, data_dir, formats)
+        return tables['temperature']
+    
+    def emissions():
+        # Only skip when the geographic output, which is derived from the
+        # same download, is up to date as well
+        unchanged = (_output_is_current('emissions', cache, OWID_CO2_URL, data_dir)
+                     and _output_is_current('geo', cache, OWID_CO2_URL, data_dir))
+        try:
+            emissions_df = fetch_co2_emissions(cache=cache, skip_unchanged=not force and unchanged,
+                                               deadline=deadline)
+        except UpstreamError as e:
+            # The geographic output stays as well, since it is derived from this one
+            keep_last_known_good('emissions', e, data_dir)
+            return None
+        if emissions_df is not None:
+            save_dataset(emissions_df, 'emissions', data_dir, formats)
+        return emissions_df
     
-    # Process CO2 emissions data
-    emissions_df = fetch_co2_emissions()
-    if emissions_df is not None:
-        emissions_df.to_csv('data/emissions_data.csv', index=False)
+    def weather():
+        # The demo events have no upstream; once generated they stay as they are
+        if not force and all(_has_output(name, data_dir) for name in ('weather', *WEATHER_CUBES)):
+            logger.info("Weather events already generated, skipping processing",
+                        extra={'fields': {'dataset': 'weather'}})
+            return None
+        weather_df = fetch_weather_events()
+        if weather_df is not None:
+            save_dataset(weather_df, 'weather', data_dir, formats)
+            # Precomputed aggregates so the apps never group the raw records
+            for name, cube in build_weather_cubes(weather_df).items():
+                save_dataset(cube.reset_index(), name, data_dir, formats)
+        return weather_df
     
-    # Process weather events data
-    weather_df = fetch_weather_events()
-    if weather_df is not None:
-        weather_df.to_csv('data/weather_events.csv', index=False)
+    def geo(emissions):
+        if emissions is None:
+            return None
+        geo_df = create_geographic_data(emissions_df=emissions)
+        if geo_df is not None:
+            save_dataset(geo_df, 'geo', data_dir, formats)
+        return geo_df
     
-    # Create and save geographic data
-    geo_df = create_geographic_data()
-    if geo_df is not None:
-        geo_df.to_csv('data/geographic_data.csv', index=False)
+    stages = {
+        'temperature': Stage(temperature),
+        'emissions': Stage(emissions),
+        'weather': Stage(weather),
+        'geo': Stage(geo, deps=('emissions',))
+    }
+    if database.enabled() if with_database is None else with_database:
+        owid_path = cache.body_path(OWID_CO2_URL)
+        stages['database'] = Stage(
+            lambda **_: save_database(data_dir, owid_path if os.path.exists(owid_path) else None),
+            deps=tuple(stages))
+    
+    start = time.perf_counter()
+    _, timings = run_pipeline(stages, max_workers=max_workers)
+    logger.info("Pipeline finished", extra={'fields': {
+        **{f"{name}_s": round(seconds, 3) for name, seconds in timings.items()},
+        'total_s': round(time.perf_counter() - start, 3)}})
+    return timings
 
 if __name__ == "__main__":
-    process_and_save_data() 
\ No newline at end of file
+    import sys
+
+    from instrumentation import configure_logging
+    configure_logging()
+    process_and_save_data(force='--force' in sys.argv[1:]) 
\ No newline at end of file
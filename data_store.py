@@ -0,0 +1,477 @@
+"""
+Server-side dataset registry shared by the dashboard apps.
+
+Each processed table is read from disk once per process and kept in memory,
+so callbacks only need to receive the filter parameters (year range,
+countries, event types) instead of the full table.
+
+Tables are read from the columnar Feather (Arrow IPC) copy written by
+data_processor when it exists, through a memory map so that processes
+sharing a host also share the page cache. The CSV is used as a fallback.
+
+When refresh.py has published a release, DATA_DIR/current is a symlink to
+an immutable directory under DATA_DIR/releases and the tables are read from
+there; the symlink is swapped atomically and each process notices the new
+target on its next version check.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregates import (TEMPERATURE_RESOLUTIONS, WEATHER_CUBES, build_weather_cubes,
+                        decadal_temperatures, period_dates)
+import database
+from indexed_series import IndexedSeries
+from instrumentation import get_logger, timer
+
+logger = get_logger('data_store')
+
+DATA_DIR = 'data'
+
+# Published dataset releases (see refresh.py) and the link to the live one
+RELEASES_DIR = 'releases'
+CURRENT_LINK = 'current'
+
+DATASET_FILES = {
+    'temperature': 'temperature_data.csv',
+    'temperature_monthly': 'temperature_monthly.csv',
+    'temperature_seasonal': 'temperature_seasonal.csv',
+    'temperature_decadal': 'temperature_decadal.csv',
+    'emissions': 'emissions_data.csv',
+    'weather': 'weather_events.csv',
+    'geo': 'geographic_data.csv',
+    'weather_by_year': 'weather_by_year.csv',
+    'weather_by_decade': 'weather_by_decade.csv',
+    'weather_cumulative': 'weather_cumulative.csv'
+}
+
+# Datasets loaded with a sorted index instead of a plain RangeIndex
+INDEX_COLUMNS = dict(WEATHER_CUBES)
+
+# Datasets also kept as IndexedSeries: entity column and the x column each
+# entity's series is sorted by
+INDEXED_SERIES = {
+    'emissions': ('country', 'year'),
+    'weather': ('Event_Type', 'Year')
+}
+
+# Datasets queried from the embedded database instead of memory when there is one
+DATABASE_TABLES = ('emissions', 'weather')
+
+# Datasets that can be rebuilt from another one when their file is missing,
+# e.g. data written before the aggregate cubes existed
+DERIVED_DATASETS = {
+    name: ('weather', lambda df, name=name: build_weather_cubes(df)[name].reset_index())
+    for name in WEATHER_CUBES
+}
+DERIVED_DATASETS['temperature_decadal'] = (
+    'temperature', lambda df: decadal_temperatures(df[df['Type'] == 'Historical']))
+
+# Datasets missing from data written before they existed, which cannot be
+# derived; preload() skips them and queries fall back to a coarser table
+OPTIONAL_DATASETS = ('temperature_monthly', 'temperature_seasonal')
+
+# Explicit on-disk dtypes for the processed datasets
+DATASET_DTYPES = {
+    'temperature': {'Year': 'int16', 'Temperature': 'float32', 'Type': 'category'},
+    'temperature_monthly': {'Year': 'int16', 'Month': 'int8', 'Date': 'datetime64[s]',
+                            'Temperature': 'float32'},
+    'temperature_seasonal': {'Year': 'int16', 'Season': 'category', 'Date': 'datetime64[s]',
+                             'Temperature': 'float32'},
+    'temperature_decadal': {'Decade': 'int16', 'Date': 'datetime64[s]', 'Temperature': 'float32'},
+    'emissions': {'country': 'category', 'iso_code': 'category', 'year': 'int16',
+                  'co2': 'float32', 'co2_per_capita': 'float32', 'population': 'float32'},
+    'weather': {'Year': 'int16', 'Event_Type': 'category', 'Count': 'int32'},
+    'geo': {'country': 'category', 'iso_code': 'category', 'year': 'int16',
+            'co2': 'float32', 'lat': 'float32', 'lon': 'float32'},
+    'weather_by_year': {'Year': 'int16'},
+    'weather_by_decade': {'Decade': 'int16'},
+    'weather_cumulative': {'Year': 'int16'}
+}
+
+COLUMNAR_SUFFIX = '.feather'
+
+# Widest visible span, in years, at which the temperature chart shows each
+# resolution; wider spans use the next coarser one
+RESOLUTION_MAX_SPANS = {'monthly': 20, 'seasonal': 60, 'annual': 300}
+
+# Decimal places kept for float values: data_processor rounds to this when
+# saving, and figures are serialized at the same precision
+DISPLAY_PRECISION = int(os.environ.get('CLIMATE_DISPLAY_PRECISION', 3))
+
+
+def columnar_path(path):
+    """Feather counterpart of a CSV dataset path"""
+    return os.path.splitext(path)[0] + COLUMNAR_SUFFIX
+
+
+def apply_dtypes(df, name):
+    """Cast the known columns of a dataset to their compact dtypes"""
+    dtypes = {column: dtype for column, dtype in DATASET_DTYPES.get(name, {}).items()
+              if column in df.columns}
+    return df.astype(dtypes)
+
+
+def round_floats(df, digits=DISPLAY_PRECISION):
+    """Round the float columns of a frame to `digits` decimal places"""
+    columns = df.select_dtypes('floating').columns
+    if not len(columns):
+        return df
+    return df.assign(**{column: df[column].round(digits) for column in columns})
+
+
+def write_columnar(df, path, name):
+    """
+    Write a dataset as uncompressed Feather so it can be memory mapped.
+    Returns False when pyarrow is not installed.
+    """
+    try:
+        from pyarrow import feather
+    except ImportError:
+        logger.warning("pyarrow is not installed, skipping columnar output")
+        return False
+
+    # Written beside the target and renamed, so readers never see a partial file
+    tmp_path = columnar_path(path) + '.tmp'
+    feather.write_feather(apply_dtypes(df, name).reset_index(drop=True),
+                          tmp_path, compression='uncompressed')
+    os.replace(tmp_path, columnar_path(path))
+    return True
+
+
+def read_dataset(path, name=None):
+    """
+    Read a dataset, preferring an up-to-date memory-mapped Feather file
+    and falling back to the CSV.
+    """
+    feather_path = columnar_path(path)
+    use_columnar = os.path.exists(feather_path) and (
+        not os.path.exists(path) or os.path.getmtime(feather_path) >= os.path.getmtime(path))
+
+    if use_columnar:
+        try:
+            from pyarrow import feather
+            table = feather.read_table(feather_path, memory_map=True)
+            return table.to_pandas(split_blocks=True)
+        except ImportError:
+            pass
+        except Exception as e:
+            logger.warning("Columnar read failed, falling back to CSV",
+                           extra={'fields': {'path': feather_path, 'error': e}})
+
+    df = pd.read_csv(path)
+    return apply_dtypes(df, name) if name else df
+
+
+class DatasetRegistry:
+    """Loads each dataset lazily, once per process, and caches the frame"""
+
+    def __init__(self, data_dir=DATA_DIR, files=None, check_interval=1.0):
+        self.data_dir = data_dir
+        self.files = dict(files or DATASET_FILES)
+        self.check_interval = check_interval
+        self._frames = {}
+        self._lock = threading.RLock()
+        self._version = None
+        self._checked_at = 0.0
+        self._root = None
+
+    def root(self):
+        """
+        Directory the datasets are read from: the release the `current`
+        link points to, or data_dir itself when no release was published
+        """
+        current = os.path.join(self.data_dir, CURRENT_LINK)
+        if os.path.isdir(current):
+            return os.path.realpath(current)
+        return self.data_dir
+
+    def path(self, name, root=None):
+        """Return the on-disk location of a dataset"""
+        return os.path.join(root or self._root or self.root(), self.files[name])
+
+    def current_root(self):
+        """root() as of the latest version check"""
+        self.version()
+        return self._root
+
+    def exists(self, name):
+        """True if a dataset can be loaded: its file is on disk or it can be derived"""
+        path = self.path(name)
+        return name in DERIVED_DATASETS or os.path.exists(path) or \
+            os.path.exists(columnar_path(path))
+
+    def _stat_version(self, root):
+        parts = [root]
+        paths = [os.path.join(root, database.DATABASE_FILE)]
+        for name in sorted(self.files):
+            paths += [self.path(name, root), columnar_path(self.path(name, root))]
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            parts.append(f"{path}:{st.st_mtime_ns}:{st.st_size}")
+        return '|'.join(parts)
+
+    def version(self):
+        """
+        Version stamp of the files on disk, re-checked at most once per
+        check_interval. Cached frames are dropped when the stamp changes,
+        e.g. after data_processor.process_and_save_data rewrites the CSVs or
+        refresh.py publishes a new release.
+        """
+        now = time.monotonic()
+        if self._version is None or now - self._checked_at >= self.check_interval:
+            root = self.root()
+            version = self._stat_version(root)
+            self._checked_at = now
+            if version != self._version:
+                with self._lock:
+                    if self._version is not None:
+                        logger.info("Dataset files changed on disk, reloading",
+                                    extra={'fields': {'data_dir': root}})
+                    self._frames.clear()
+                    self._root = root
+                    self._version = version
+        return self._version
+
+    def get(self, name):
+        """Return the cached DataFrame for a dataset, loading it on first use"""
+        self.version()
+        df = self._frames.get(name)
+        if df is not None:
+            return df
+
+        with self._lock:
+            df = self._frames.get(name)
+            if df is None:
+                df = self._load(name)
+                self._frames[name] = df
+        return df
+
+    def series(self, name):
+        """IndexedSeries of a dataset (see INDEXED_SERIES), built on first use"""
+        key = f"{name}:series"
+        self.version()
+        index = self._frames.get(key)
+        if index is not None:
+            return index
+
+        with self._lock:
+            index = self._frames.get(key)
+            if index is None:
+                df = self.get(name)
+                index = self._frames[key] = IndexedSeries.from_frame(df, *INDEXED_SERIES[name])
+        return index
+
+    def _load(self, name):
+        path = self.path(name)
+        with timer('dashboard_dataset_load_seconds', dataset=name):
+            if name in DERIVED_DATASETS and not (
+                    os.path.exists(path) or os.path.exists(columnar_path(path))):
+                source, derive = DERIVED_DATASETS[name]
+                logger.info("Dataset file missing, deriving it",
+                            extra={'fields': {'dataset': name, 'source': source, 'path': path}})
+                df = apply_dtypes(derive(self.get(source)), name)
+            else:
+                df = read_dataset(path, name)
+
+            if name in INDEX_COLUMNS:
+                df = df.set_index(INDEX_COLUMNS[name]).sort_index()
+        logger.info("Dataset loaded", extra={'fields': {'dataset': name, 'rows': len(df)}})
+        return df
+
+    def preload(self, names=None):
+        """
+        Load the given datasets ahead of the first request: by default all
+        of them, except those queried from the embedded database
+        """
+        if names is None and database_path():
+            names = [name for name in self.files if name not in DATABASE_TABLES]
+        for name in names or self.files:
+            if name in OPTIONAL_DATASETS and not self.exists(name):
+                continue
+            self.get(name)
+            if name in INDEXED_SERIES:
+                self.series(name)
+
+    def clear(self):
+        """Drop all cached frames so the next access re-reads them from disk"""
+        with self._lock:
+            self._frames.clear()
+            self._version = None
+            self._root = None
+
+
+registry = DatasetRegistry()
+
+
+def dataset_version():
+    """Version stamp of the shared registry's datasets"""
+    return registry.version()
+
+
+def _year_mask(df, column, years):
+    return (df[column] >= years[0]) & (df[column] <= years[1])
+
+
+def filter_temperature(years):
+    """Temperature rows inside the inclusive year range"""
+    df = registry.get('temperature')
+    return df[_year_mask(df, 'Year', years)]
+
+
+def temperature_history():
+    """Observed (non-prediction) rows of the temperature dataset"""
+    df = registry.get('temperature')
+    return df[df['Type'] == 'Historical']
+
+
+def temperature_resolutions():
+    """Temperature resolutions whose dataset is available, finest first"""
+    return [resolution for resolution, name in TEMPERATURE_RESOLUTIONS.items()
+            if registry.exists(name)]
+
+
+def resolution_for_span(span_years, available=None):
+    """
+    Finest available temperature resolution for a visible span of
+    span_years, see RESOLUTION_MAX_SPANS
+    """
+    available = available or temperature_resolutions()
+    for resolution in available:
+        if span_years <= RESOLUTION_MAX_SPANS.get(resolution, float('inf')):
+            return resolution
+    return available[-1]
+
+
+def filter_temperature_at(resolution, years):
+    """
+    Observed temperatures at a resolution ('monthly', 'seasonal', 'annual'
+    or 'decadal') inside the year range, with a Date column to plot against
+    """
+    if resolution == 'annual':
+        df = temperature_history()
+        df = df[_year_mask(df, 'Year', years)]
+        return df.assign(Date=period_dates(df['Year'], 7))
+    df = registry.get(TEMPERATURE_RESOLUTIONS[resolution])
+    column = 'Decade' if resolution == 'decadal' else 'Year'
+    start = (years[0] // 10) * 10 if resolution == 'decadal' else years[0]
+    return df[_year_mask(df, column, [start, years[1]])]
+
+
+def database_path():
+    """
+    The embedded database of the live datasets when CLIMATE_DATABASE is set
+    and one was built (see database.py), otherwise None and queries use the
+    in-memory frames
+    """
+    if not database.enabled():
+        return None
+    path = os.path.join(registry.current_root(), database.DATABASE_FILE)
+    return path if os.path.exists(path) else None
+
+
+def query(sql, params=()):
+    """Ad-hoc SQL over the embedded database, e.g. aggregations of the full OWID table"""
+    path = database_path()
+    if path is None:
+        raise RuntimeError("No embedded database; set CLIMATE_DATABASE and run data_processor.py")
+    # A rebuilt file changes the version, so connections to the old one are retired
+    return database.query(path, sql, params, version=registry.version())
+
+
+def _select_sql(table, key, values, x, years, columns='*'):
+    sql = (f"SELECT {columns} FROM {table} WHERE {key} IN ({database.placeholders(values)}) "
+           f"AND {x} BETWEEN ? AND ? ORDER BY {key}, {x}")
+    return sql, [*values, int(years[0]), int(years[1])]
+
+
+def _select(table, key, values, x, years):
+    """Rows of a table for the key values inside the inclusive x range, using its index"""
+    return apply_dtypes(query(*_select_sql(table, key, values, x, years)), table)
+
+
+def _select_series(table, key, values, x, years, column):
+    """
+    (key, x, values) series of the selected keys from the database, in the
+    order of `values` and with the dataset's dtypes
+    """
+    dtypes = DATASET_DTYPES[table]
+    keys, xs, ys = database.query_arrays(
+        database_path(), *_select_sql(table, key, values, x, years, f"{key}, {x}, {column}"),
+        dtypes=[object, dtypes.get(x, 'float64'), dtypes.get(column, 'float64')],
+        version=registry.version())
+    if not len(keys):
+        return []
+    # Rows are ordered by key, so each key's rows are one contiguous run
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    runs = {keys[start]: slice(start, stop) for start, stop in zip(starts, np.r_[starts[1:], len(keys)])}
+    return [(value, xs[runs[value]], ys[runs[value]]) for value in values if value in runs]
+
+
+def filter_emissions(countries, years):
+    """Emissions rows for the selected countries inside the year range"""
+    if database_path():
+        return _select('emissions', 'country', countries, 'year', years)
+    df = registry.get('emissions')
+    return df[df['country'].isin(countries) & _year_mask(df, 'year', years)]
+
+
+def country_series(countries, years, column='co2'):
+    """
+    (country, years, values) array views of each selected country's
+    emissions inside the year range, skipping countries without data
+    """
+    if database_path():
+        if column not in DATASET_DTYPES['emissions']:
+            raise ValueError(f"Unknown emissions column {column!r}")
+        return _select_series('emissions', 'country', countries, 'year', years, column)
+    return registry.series('emissions').series(countries, column, years)
+
+
+def event_series(event_types, years):
+    """(event type, years, counts) array views of the raw weather records"""
+    if database_path():
+        return _select_series('weather', 'Event_Type', event_types, 'Year', years, 'Count')
+    return registry.series('weather').series(event_types, 'Count', years)
+
+
+def filter_weather(event_types, years):
+    """Weather event rows for the selected event types inside the year range"""
+    if database_path():
+        return _select('weather', 'Event_Type', event_types, 'Year', years)
+    df = registry.get('weather')
+    return df[df['Event_Type'].isin(event_types) & _year_mask(df, 'Year', years)]
+
+
+def country_options():
+    """Sorted list of countries available in the emissions dataset"""
+    if database_path():
+        return query("SELECT DISTINCT country FROM emissions ORDER BY country")['country'].tolist()
+    return sorted(registry.get('emissions')['country'].unique())
+
+
+def weather_counts(event_types, years, resolution='year'):
+    """
+    Event counts for the selected event types inside the year range, as a
+    slice of the precomputed cube for the resolution ('year', 'decade' or
+    'cumulative'), indexed by Year/Decade with one column per event type
+    """
+    name = {'year': 'weather_by_year', 'decade': 'weather_by_decade',
+            'cumulative': 'weather_cumulative'}[resolution]
+    cube = registry.get(name)
+    start, end = years
+    if resolution == 'decade':
+        start = (start // 10) * 10
+    columns = [event for event in event_types if event in cube.columns]
+    return cube.loc[start:end, columns]
+
+
+def event_types():
+    """Sorted list of event types available in the weather dataset"""
+    return sorted(registry.get('weather_by_year').columns)
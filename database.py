@@ -0,0 +1,200 @@
+"""
+Optional embedded SQLite copy of the processed datasets.
+
+With CLIMATE_DATABASE=sqlite, data_processor.process_and_save_data also
+loads every processed dataset, and the full OWID CO2 table (all columns and
+all countries, read in chunks from the cached download), into DATABASE_FILE
+in the data directory, indexed for the dashboard queries. The file is built
+beside its target and renamed into place, so it is swapped together with the
+CSVs and, under refresh.py, lives inside the immutable release directory.
+
+Readers share a small pool of read-only connections per database file, so
+worker threads can query it concurrently without every process holding the
+full tables in memory.
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import get_logger, metrics, timer
+
+logger = get_logger('database')
+
+DATABASES = ('none', 'sqlite')
+DATABASE = os.environ.get('CLIMATE_DATABASE', 'none')
+if DATABASE not in DATABASES:
+    raise ValueError(f"CLIMATE_DATABASE={DATABASE!r}, expected one of {DATABASES}")
+
+DATABASE_FILE = 'climate.sqlite'
+
+# Read-only connections kept open per database file
+POOL_SIZE = int(os.environ.get('CLIMATE_DB_POOL_SIZE', 4))
+
+# Table holding the unfiltered OWID export
+OWID_TABLE = 'owid'
+
+# Indexes created after loading: table -> column tuples
+TABLE_INDEXES = {
+    'emissions': [('country', 'year')],
+    'geo': [('country', 'year')],
+    'weather': [('Event_Type', 'Year')],
+    OWID_TABLE: [('country', 'year'), ('iso_code', 'year')]
+}
+
+metrics.describe('dashboard_db_query_seconds', 'histogram',
+                 'Time to run a query against the embedded database')
+
+
+def enabled():
+    return DATABASE != 'none'
+
+
+def write_database(path, tables, owid_path=None, chunksize=50000):
+    """
+    Build a SQLite database at path from a dict of DataFrames and,
+    optionally, the OWID CSV at owid_path (loaded in chunks of `chunksize`
+    rows so the whole export is never in memory), then create the
+    TABLE_INDEXES. Returns the path.
+    """
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        # A half-built file is discarded anyway, so skip the journal
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute('PRAGMA synchronous=OFF')
+        for name, df in tables.items():
+            df.to_sql(name, conn, index=False, chunksize=chunksize)
+        if owid_path:
+            for chunk in pd.read_csv(owid_path, chunksize=chunksize, low_memory=False):
+                chunk.to_sql(OWID_TABLE, conn, index=False, if_exists='append')
+
+        loaded = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        for table, indexes in TABLE_INDEXES.items():
+            if table not in loaded:
+                continue
+            for columns in indexes:
+                conn.execute(f"CREATE INDEX idx_{table}_{'_'.join(columns)} "
+                             f"ON {table} ({', '.join(columns)})")
+        conn.execute('ANALYZE')
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    logger.info("Database written", extra={'fields': {'path': path, 'tables': len(loaded)}})
+    return path
+
+
+class ConnectionPool:
+    """Read-only connections to one SQLite file, handed to one thread at a time"""
+
+    def __init__(self, path, size=POOL_SIZE, timeout=30.0):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def _connect(self):
+        uri = f"file:{os.path.abspath(self.path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute('PRAGMA query_only=1')
+        conn.execute('PRAGMA mmap_size=268435456')
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, opening one while fewer than `size` exist"""
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    conn = self._connect()
+            if conn is None:
+                conn = self._idle.get(timeout=self.timeout)
+        try:
+            yield conn
+        finally:
+            if self._closed:
+                conn.close()
+            else:
+                self._idle.put(conn)
+
+    def close(self):
+        """Close idle connections now and borrowed ones when they are returned"""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool(path, version=None):
+    """
+    Shared ConnectionPool for a database file, per version of the file
+    (connections keep reading a replaced file). Pools of other files or
+    versions are closed once a new one is first used.
+    """
+    key = (path, version)
+    current = _pools.get(key)
+    if current is not None:
+        return current
+    with _pools_lock:
+        current = _pools.get(key)
+        if current is None:
+            for old in _pools.values():
+                old.close()
+            _pools.clear()
+            current = _pools[key] = ConnectionPool(path)
+    return current
+
+
+def query(path, sql, params=(), version=None):
+    """Run a query on the database at path and return the rows as a DataFrame"""
+    with timer('dashboard_db_query_seconds'), pool(path, version).connection() as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+
+def query_chunks(path, sql, params=(), chunksize=5000, version=None):
+    """
+    DataFrames of `chunksize` rows read lazily from a query. A pooled
+    connection is held until the generator is exhausted or closed.
+    """
+    with pool(path, version).connection() as conn:
+        yield from pd.read_sql_query(sql, conn, params=params, chunksize=chunksize)
+
+
+def query_arrays(path, sql, params=(), dtypes=None, version=None):
+    """
+    Run a query and return its columns as a list of NumPy arrays of the
+    given dtypes (NULLs become NaN in float columns), without the
+    DataFrame construction of query() for small hot-path reads
+    """
+    with timer('dashboard_db_query_seconds'), pool(path, version).connection() as conn:
+        cursor = conn.execute(sql, params)
+        rows = cursor.fetchall()
+        width = len(cursor.description)
+    dtypes = dtypes or [None] * width
+    columns = zip(*rows) if rows else [()] * width
+    return [np.array(column, dtype=dtype) for column, dtype in zip(columns, dtypes)]
+
+
+def placeholders(values):
+    return ', '.join('?' * len(values))
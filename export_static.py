@@ -0,0 +1,174 @@
+"""
+Static snapshot of the dashboard's default view.
+
+    python export_static.py     # writes CLIMATE_STATIC_DIR (default: site)
+    python simple_server.py     # serves it
+
+The page is rendered once through the Flask test client of a Dash app
+holding the default figures, selector options and control values in its
+layout and no callbacks, with every component bundle (plotly.js included)
+loaded eagerly so the snapshot needs no /_dash-component-suites route. The
+Dash index page, layout, dependency list and bundles are written at the
+paths the renderer requests them from, and the figures also as
+figures/<name>.json. Viewers can pan, zoom and hover; the controls are
+disabled since nothing answers them.
+
+Every compressible file gets maximally compressed .gz and .br siblings
+(brotli only when the package is installed), which simple_server.py picks
+by Accept-Encoding. The snapshot is built beside the target directory and
+swapped in with a rename, so a running server never serves a half-written one.
+"""
+import gzip
+import json
+import mimetypes
+import os
+import re
+import shutil
+import time
+
+import dash
+import dash_bootstrap_components as dbc
+from plotly.utils import PlotlyJSONEncoder
+
+import data_store
+import forecasting
+import minimal_app
+import rendering
+from compression import COMPRESSED_MIMETYPES
+from instrumentation import get_logger
+from simple_server import DASH_ENDPOINTS, STATIC_DIR
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = get_logger('export_static')
+
+# Same-origin resources referenced by the index page
+LOCAL_REFERENCE = re.compile(r'(?:src|href)="(/[^"]*)"')
+
+CONTROLS = ('temperature-year-slider', 'temperature-model-selector', 'temperature-horizon-slider',
+            'country-selector', 'emissions-year-slider', 'event-type-selector', 'weather-year-slider')
+
+
+def default_figures():
+    """Figures of the default view, as the server callbacks first return them"""
+    budget = rendering.point_budget()
+    return {
+        'temperature': minimal_app.temperature_figure(minimal_app.DEFAULT_TEMPERATURE_YEARS, 'linear',
+                                                      forecasting.DEFAULT_HORIZON, None, budget),
+        'emissions': minimal_app.emissions_figure(minimal_app.DEFAULT_COUNTRIES,
+                                                  minimal_app.DEFAULT_EMISSIONS_YEARS, None, budget),
+        'weather': minimal_app.weather_figure(data_store.event_types(),
+                                              minimal_app.DEFAULT_WEATHER_YEARS, None, budget)
+    }
+
+
+def snapshot_layout(figures):
+    """The dashboard layout with the figures and options filled in and the controls disabled"""
+    layout = minimal_app.build_layout()
+    for name, figure in figures.items():
+        layout[f'{name}-graph'].figure = figure
+
+    event_types = data_store.event_types()
+    layout['country-selector'].options = [{'label': country, 'value': country}
+                                          for country in data_store.country_options()]
+    layout['event-type-selector'].options = [{'label': event, 'value': event}
+                                             for event in event_types]
+    layout['event-type-selector'].value = event_types
+    for control in CONTROLS:
+        layout[control].disabled = True
+    return layout
+
+
+def snapshot_app(figures):
+    """Dash app serving the snapshot layout, with all component bundles loaded up front"""
+    app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP],
+                    eager_loading=True, include_assets_files=False)
+    app.layout = snapshot_layout(figures)
+    return app
+
+
+def compressible(path):
+    if os.path.basename(path) in DASH_ENDPOINTS:
+        return True
+    mimetype, _ = mimetypes.guess_type(path)
+    return mimetype in COMPRESSED_MIMETYPES or path.endswith(('.js', '.json'))
+
+
+def write_file(root, url_path, data):
+    """Write data at the path a URL maps to, plus .gz/.br variants that are smaller"""
+    path = os.path.join(root, *url_path.strip('/').split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    sizes = {'identity': len(data)}
+    if compressible(path):
+        variants = {'gz': gzip.compress(data, 9, mtime=0)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(data, quality=11)
+        for suffix, compressed in variants.items():
+            if len(compressed) < len(data):
+                with open(f"{path}.{suffix}", 'wb') as f:
+                    f.write(compressed)
+                sizes[suffix] = len(compressed)
+    return sizes
+
+
+def export(output_dir=STATIC_DIR):
+    """Write the snapshot to output_dir, replacing any previous one; returns the file count"""
+    started = time.perf_counter()
+    data_store.registry.preload()
+    figures = default_figures()
+    client = snapshot_app(figures).server.test_client()
+
+    output_dir = os.path.abspath(output_dir)
+    staging = f"{output_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+
+    def fetch(url_path):
+        response = client.get(url_path)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url_path} returned {response.status_code}")
+        return response.get_data()
+
+    index = fetch('/')
+    written = {'/index.html': write_file(staging, '/index.html', index)}
+    for endpoint in DASH_ENDPOINTS:
+        written[f'/{endpoint}'] = write_file(staging, endpoint, fetch(f'/{endpoint}'))
+    for reference in LOCAL_REFERENCE.findall(index.decode('utf-8')):
+        url_path = reference.split('?', 1)[0]
+        written[url_path] = write_file(staging, url_path, fetch(reference))
+    for name, figure in figures.items():
+        data = json.dumps(figure, cls=PlotlyJSONEncoder, separators=(',', ':')).encode('utf-8')
+        written[f'/figures/{name}.json'] = write_file(staging, f'/figures/{name}.json', data)
+
+    previous = f"{output_dir}.old-{os.getpid()}"
+    if os.path.exists(output_dir):
+        os.rename(output_dir, previous)
+    os.rename(staging, output_dir)
+    shutil.rmtree(previous, ignore_errors=True)
+
+    logger.info("Static snapshot written", extra={'fields': {
+        'path': output_dir,
+        'files': len(written),
+        'bytes': sum(sizes['identity'] for sizes in written.values()),
+        'compressed_bytes': sum(min(sizes.values()) for sizes in written.values()),
+        'duration_s': round(time.perf_counter() - started, 3)
+    }})
+    return len(written)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from instrumentation import configure_logging
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', default=STATIC_DIR,
+                        help='snapshot directory (default: %(default)s)')
+    args = parser.parse_args()
+
+    configure_logging()
+    export(args.output)
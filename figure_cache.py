@@ -0,0 +1,168 @@
+"""
+Bounded LRU/TTL cache of built Plotly figures.
+
+Callback results are keyed on the callback name, the callback inputs and
+the dataset version stamp, so a rewrite of the processed data invalidates
+every cached figure without an explicit flush. Only figures of the
+registry's current version are stored, and the first of a new version
+drops the entries of the previous one, so requests still finishing on the
+old release cannot evict the new one's. Figures are
+kept as the plain dicts Dash serializes, converted once when built, so a
+hit costs a dict lookup. Callers must not modify them. Figures for the
+default view can be pinned: they never expire and are never evicted, so a
+server that prebuilds them before forking serves them to every worker.
+Pinned figures are rebuilt on a background thread when the version moves.
+"""
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import data_store
+from instrumentation import get_logger, metrics, timer
+
+logger = get_logger('figure_cache')
+
+
+def normalize(value):
+    """Turn callback inputs into a hashable cache key component"""
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize(v)) for k, v in value.items()))
+    return value
+
+
+class FigureCache:
+    """Thread-safe LRU cache with a per-entry time-to-live"""
+
+    def __init__(self, maxsize=256, ttl=600, version_func=data_store.dataset_version):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version_func = version_func
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._pinned = set()
+        # (name, normalized args) -> (callback, args) of every pinned figure
+        self._pins = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached figure for key, or None on a miss or expired entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, payload = entry
+                if key in self._pinned or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, payload):
+        """
+        Store a built figure, evicting the least recently used entry.
+        Figures built for a version the registry has since moved past are
+        not stored. The first figure of the current version drops every
+        entry, pinned or not, of the previous one, since their keys can no
+        longer be hit, and starts rebuilding the pinned figures.
+        """
+        version = self.version_func()
+        if key[1] != version:
+            return
+        with self._lock:
+            repin = version != self._version and self._version is not None and bool(self._pins)
+            if version != self._version:
+                self._version = version
+                for old_key in [k for k in self._entries if k[1] != version]:
+                    del self._entries[old_key]
+                self._pinned = {k for k in self._pinned if k[1] == version}
+            self._entries[key] = (time.monotonic() + self.ttl, payload)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                for old_key in list(self._entries):
+                    if len(self._entries) <= self.maxsize:
+                        break
+                    if old_key not in self._pinned:
+                        del self._entries[old_key]
+        if repin:
+            threading.Thread(target=self._repin, args=(version,), name='figure-repin',
+                             daemon=True).start()
+
+    def _repin(self, version):
+        """Pin every pinned figure again for version, unless it is replaced meanwhile"""
+        with self._lock:
+            pins = list(self._pins.values())
+        for func, args in pins:
+            if self.version_func() != version:
+                return
+            try:
+                self.pin(func, *args)
+            except Exception:
+                logger.exception("Could not rebuild a pinned figure",
+                                 extra={'fields': {'figure': func.cache_name}})
+
+    def pin(self, func, *args):
+        """
+        Build (or fetch) the figure of a memoized callback for args and keep
+        it cached regardless of TTL and LRU pressure, until a figure for a
+        newer dataset version is stored (see put), which rebuilds and pins
+        it again
+        """
+        name = func.cache_name
+        with self._lock:
+            self._pins[(name, normalize(args))] = (func, args)
+        func(*args)
+        key = (name, self.version_func(), normalize(args))
+        with self._lock:
+            if key in self._entries:
+                self._pinned.add(key)
+        return key
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pinned.clear()
+            self._pins.clear()
+            self._version = None
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'pinned': len(self._pinned),
+                'maxsize': self.maxsize
+            }
+
+    def memoize(self, name):
+        """Decorator caching a figure-building callback under the given name"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args):
+                key = (name, self.version_func(), normalize(args))
+                payload = self.get(key)
+                metrics.inc('dashboard_figure_cache_requests_total', figure=name,
+                            result='miss' if payload is None else 'hit')
+                if payload is None:
+                    with timer('dashboard_figure_build_seconds', figure=name):
+                        fig = func(*args)
+                        # One JSON round trip turns arrays into the plain lists
+                        # Dash serializes; hits reuse the result as is
+                        payload = json.loads(fig.to_json() if hasattr(fig, 'to_json')
+                                             else json.dumps(fig))
+                    self.put(key, payload)
+                return payload
+            wrapper.cache_name = name
+            return wrapper
+        return decorator
+
+
+figure_cache = FigureCache()
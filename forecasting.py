@@ -0,0 +1,189 @@
+"""
+Trend models for temperature predictions.
+
+Several model types share one interface (fit on a yearly series, predict
+arbitrary future years). Fitted models are cached in memory and pickled
+under data/models, keyed by a hash of the input series and the model
+parameters, so a model is only refit when the data changes. sklearn and
+statsmodels are imported on first use.
+"""
+import hashlib
+import os
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_DIR
+from instrumentation import get_logger
+
+logger = get_logger('forecasting')
+
+MODEL_DIR = os.path.join(DATA_DIR, 'models')
+
+DEFAULT_HORIZON = 30
+
+
+class LinearTrend:
+    """Ordinary least squares line through the yearly values"""
+
+    label = 'Linear'
+
+    def fit(self, years, values):
+        from sklearn.linear_model import LinearRegression
+        self.model = LinearRegression()
+        self.model.fit(years.reshape(-1, 1), values)
+        return self
+
+    def predict(self, future_years):
+        return self.model.predict(future_years.reshape(-1, 1))
+
+
+class PolynomialTrend:
+    """Least squares polynomial (quadratic by default)"""
+
+    label = 'Polynomial'
+
+    def __init__(self, degree=2):
+        self.degree = degree
+
+    def fit(self, years, values):
+        self.poly = np.polynomial.Polynomial.fit(years, values, self.degree)
+        return self
+
+    def predict(self, future_years):
+        return self.poly(future_years)
+
+
+class LowessTrend:
+    """
+    LOWESS smoothed curve, extrapolated with the slope of its most recent
+    `tail` years
+    """
+
+    label = 'LOWESS'
+
+    def __init__(self, frac=0.3, tail=20):
+        self.frac = frac
+        self.tail = tail
+
+    def fit(self, years, values):
+        from statsmodels.nonparametric.smoothers_lowess import lowess
+        smoothed = lowess(values, years, frac=self.frac, return_sorted=True)
+        recent = smoothed[-self.tail:]
+        self.slope = np.polyfit(recent[:, 0], recent[:, 1], 1)[0]
+        self.last_year, self.last_value = smoothed[-1]
+        return self
+
+    def predict(self, future_years):
+        return self.last_value + self.slope * (future_years - self.last_year)
+
+
+class ArimaTrend:
+    """statsmodels ARIMA with drift on the yearly series"""
+
+    label = 'ARIMA'
+
+    def __init__(self, order=(1, 1, 1)):
+        self.order = tuple(order)
+
+    def fit(self, years, values):
+        from statsmodels.tsa.arima.model import ARIMA
+        self.last_year = int(years[-1])
+        self.results = ARIMA(values, order=self.order, trend='t').fit()
+        return self
+
+    def predict(self, future_years):
+        steps = int(future_years.max()) - self.last_year
+        if steps <= 0:
+            return np.full(len(future_years), np.nan)
+        path = np.asarray(self.results.forecast(steps=steps))
+        return path[(future_years - self.last_year - 1).astype(int)]
+
+
+MODEL_TYPES = {
+    'linear': LinearTrend,
+    'polynomial': PolynomialTrend,
+    'lowess': LowessTrend,
+    'arima': ArimaTrend
+}
+
+_models = {}
+_lock = threading.Lock()
+
+
+def _prepare(years, values):
+    years = np.asarray(years, dtype='float64')
+    values = np.asarray(values, dtype='float64')
+    keep = ~np.isnan(values)
+    order = np.argsort(years[keep], kind='stable')
+    return years[keep][order], values[keep][order]
+
+
+def model_key(kind, years, values, params=None):
+    """Hash identifying a model type, its parameters and the input series"""
+    digest = hashlib.sha256()
+    digest.update(kind.encode('utf-8'))
+    digest.update(repr(sorted((params or {}).items())).encode('utf-8'))
+    digest.update(years.tobytes())
+    digest.update(values.tobytes())
+    return f"{kind}-{digest.hexdigest()[:24]}"
+
+
+def get_model(kind, years, values, model_dir=MODEL_DIR, **params):
+    """
+    Return a fitted model for the series, from memory, from the pickled
+    copy in model_dir, or by fitting and persisting it
+    """
+    if kind not in MODEL_TYPES:
+        raise ValueError(f"Unknown model type {kind!r}, expected one of {sorted(MODEL_TYPES)}")
+
+    years, values = _prepare(years, values)
+    key = model_key(kind, years, values, params)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+
+        path = os.path.join(model_dir, key + '.pkl') if model_dir else None
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    model = pickle.load(f)
+            except Exception as e:
+                logger.warning("Cached model unreadable, refitting",
+                               extra={'fields': {'path': path, 'error': e}})
+
+        if model is None:
+            logger.info("Fitting trend model", extra={'fields': {'kind': kind, 'points': len(years)}})
+            model = MODEL_TYPES[kind](**params).fit(years, values)
+            if path:
+                os.makedirs(model_dir, exist_ok=True)
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump(model, f)
+                os.replace(tmp_path, path)
+
+        _models[key] = model
+    return model
+
+
+def forecast(years, values, kind='linear', horizon=DEFAULT_HORIZON, model_dir=MODEL_DIR, **params):
+    """
+    Predict `horizon` years past the end of the series with a cached model.
+    Returns a DataFrame with Year, Temperature and Type='Prediction' columns.
+    """
+    model = get_model(kind, years, values, model_dir=model_dir, **params)
+    last_year = int(np.nanmax(np.asarray(years, dtype='float64')))
+    future_years = np.arange(last_year + 1, last_year + horizon + 1)
+
+    return pd.DataFrame({
+        'Year': future_years,
+        'Temperature': model.predict(future_years.astype('float64')),
+        'Type': 'Prediction'
+    })
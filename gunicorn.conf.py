@@ -0,0 +1,34 @@
+"""
+gunicorn settings for serving wsgi:server.
+
+Environment: CLIMATE_BIND (default 0.0.0.0:8050), WEB_CONCURRENCY (worker
+count, default 2 x CPUs + 1), CLIMATE_THREADS (threads per worker),
+CLIMATE_STARTUP (preload, background or lazy, see startup.py) and
+CLIMATE_REFRESH_INTERVAL (seconds between dataset refreshes, see refresh.py).
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('CLIMATE_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('CLIMATE_THREADS', 2))
+
+# Import the app (and preload data and figures) in the master before forking.
+# In background mode each worker imports it and warms up on its own thread,
+# which would not survive the fork.
+preload_app = os.environ.get('CLIMATE_STARTUP', 'preload') != 'background'
+timeout = 60
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far into the permanent generation, so the
+    # cyclic GC in the workers does not touch (and copy) the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Threads do not survive a fork, so each worker runs its own scheduler;
+    # the refresh lock and release age let only one of them refresh
+    import refresh
+    refresh.start_scheduler()
@@ -0,0 +1,141 @@
+"""
+On-disk HTTP cache for the upstream data sources.
+
+Raw response bodies are stored next to their validators (ETag and
+Last-Modified) so that the next refresh can issue a conditional GET and
+reuse the cached body when the server answers 304 Not Modified.
+"""
+import hashlib
+import json
+import os
+import time
+
+from data_store import DATA_DIR
+
+HTTP_CACHE_DIR = os.environ.get('CLIMATE_HTTP_CACHE_DIR',
+                                os.path.join(DATA_DIR, 'http_cache'))
+
+
+class CachedResponse:
+    """Minimal stand-in for requests.Response backed by a cached body"""
+
+    status_code = 200
+
+    def __init__(self, url, body_path, meta):
+        self.url = url
+        self.body_path = body_path
+        self.meta = meta
+        self.headers = {k: v for k, v in (('ETag', meta.get('etag')),
+                                          ('Last-Modified', meta.get('last_modified'))) if v}
+        self.from_cache = True
+        self.not_modified = True
+        self._content = None
+
+    @property
+    def content(self):
+        if self._content is None:
+            with open(self.body_path, 'rb') as f:
+                self._content = f.read()
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode(self.meta.get('encoding') or 'utf-8')
+
+    def open(self):
+        """Binary file object over the cached body, for streaming parsers"""
+        return open(self.body_path, 'rb')
+
+    def raise_for_status(self):
+        pass
+
+
+class HTTPCache:
+    """Stores raw responses and their validators, one pair of files per URL"""
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _base(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode('utf-8')).hexdigest()[:32])
+
+    def body_path(self, url):
+        return self._base(url) + '.body'
+
+    def meta_path(self, url):
+        return self._base(url) + '.json'
+
+    def load_meta(self, url):
+        """Return the stored metadata for url, or None if nothing usable is cached"""
+        try:
+            with open(self.meta_path(url)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self.body_path(url)):
+            return None
+        return meta
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since headers for a cached url"""
+        meta = self.load_meta(url)
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def cached_response(self, url):
+        """Response object for the cached body of url, or None"""
+        meta = self.load_meta(url)
+        if meta is None:
+            return None
+        return CachedResponse(url, self.body_path(url), meta)
+
+    def store(self, url, response):
+        """Persist a 200 response body and its validators"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        body_path = self.body_path(url)
+        tmp_path = body_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(response.content)
+        os.replace(tmp_path, body_path)
+        self._store_meta(url, response, len(response.content))
+
+    def store_stream(self, url, response, chunk_size=1 << 20):
+        """
+        Persist a streamed (stream=True) 200 response chunk by chunk, so the
+        body is never held in memory, and return a CachedResponse over it
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        body_path = self.body_path(url)
+        tmp_path = body_path + '.tmp'
+        size = 0
+        with open(tmp_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, body_path)
+        meta = self._store_meta(url, response, size)
+
+        cached = CachedResponse(url, body_path, meta)
+        cached.from_cache = False
+        cached.not_modified = False
+        return cached
+
+    def _store_meta(self, url, response, size):
+        meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'encoding': response.encoding,
+            'size': size,
+            'fetched_at': time.time()
+        }
+        tmp_path = self.meta_path(url) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path(url))
+        return meta
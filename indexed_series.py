@@ -0,0 +1,74 @@
+"""
+Array-backed store of per-entity time series.
+
+A long table (one row per entity and year, e.g. country x year emissions)
+is sorted once by entity and then by x and kept as contiguous NumPy arrays,
+with an offsets array marking where each entity's rows start. Looking up an
+entity is a dict lookup, and cutting its series to an x range is a binary
+search, so a lookup costs O(log n) however many entities there are. The
+returned arrays are views into the shared buffers, not copies.
+"""
+import numpy as np
+import pandas as pd
+
+
+class IndexedSeries:
+    """Per-entity series sorted by x, stored contiguously with an offsets index"""
+
+    def __init__(self, keys, offsets, x, columns):
+        self._positions = {key: i for i, key in enumerate(keys)}
+        self.keys = list(keys)
+        self.offsets = offsets
+        self.x = x
+        self.columns = columns
+
+    @classmethod
+    def from_frame(cls, df, key, x, values=None):
+        """
+        Build from a long DataFrame: `key` names the entity column, `x` the
+        column each series is sorted by and `values` the value columns to
+        keep (every other numeric column by default)
+        """
+        if values is None:
+            values = [column for column in df.select_dtypes('number').columns
+                      if column not in (key, x)]
+        codes, keys = pd.factorize(df[key], sort=True)
+        x_values = df[x].to_numpy()
+        order = np.lexsort((x_values, codes))
+
+        counts = np.bincount(codes[order], minlength=len(keys))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        columns = {column: np.ascontiguousarray(df[column].to_numpy()[order]) for column in values}
+        return cls([str(k) for k in keys], offsets, np.ascontiguousarray(x_values[order]), columns)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def __len__(self):
+        return len(self.keys)
+
+    def bounds(self, key, x_range=None):
+        """Row interval [start, stop) of an entity, cut to the inclusive x_range"""
+        i = self._positions.get(key)
+        if i is None:
+            return 0, 0
+        start, stop = int(self.offsets[i]), int(self.offsets[i + 1])
+        if x_range is not None:
+            x = self.x[start:stop]
+            stop = start + int(np.searchsorted(x, x_range[1], side='right'))
+            start = start + int(np.searchsorted(x, x_range[0], side='left'))
+        return start, max(start, stop)
+
+    def get(self, key, column, x_range=None):
+        """(x, values) views of an entity's series inside x_range; empty if unknown"""
+        start, stop = self.bounds(key, x_range)
+        return self.x[start:stop], self.columns[column][start:stop]
+
+    def series(self, keys, column, x_range=None):
+        """(key, x, values) for each of keys that has points inside x_range"""
+        items = []
+        for key in keys:
+            x, y = self.get(key, column, x_range)
+            if len(x):
+                items.append((key, x, y))
+        return items
@@ -0,0 +1,242 @@
+"""
+Metrics and structured logging for the dashboard apps.
+
+A small in-process metrics registry records counters and latency/size
+histograms for callbacks, dataset loads, figure builds and the figure
+cache, and renders them in the Prometheus text format on a /metrics route
+of the Flask server underneath a Dash app. Metrics are per process; under
+gunicorn each worker exposes its own.
+
+Log records are emitted as logfmt (key=value) lines, or JSON lines when
+CLIMATE_LOG_FORMAT=json, with any extra fields passed via
+`extra={'fields': {...}}`.
+"""
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7)
+
+DASH_UPDATE_PATH = '/_dash-update-component'
+
+
+class Metrics:
+    """Thread-safe registry of labelled counters and histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def describe(self, name, kind, help_text, buckets=None):
+        """Register a metric's type ('counter' or 'histogram') and help text"""
+        self._meta[name] = (kind, help_text, tuple(buckets or LATENCY_BUCKETS))
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        buckets = self._meta.get(name, ('histogram', '', LATENCY_BUCKETS))[2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def value(self, name, **labels):
+        """Current value of a counter, or the observation count of a histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            histogram = self._histograms.get(key)
+            return histogram[2] if histogram else 0
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()}
+
+        lines = []
+        counter_names = {name for name, _ in counters}
+        for name in sorted(counter_names | {name for name, _ in histograms}):
+            default = ('counter' if name in counter_names else 'histogram', '', LATENCY_BUCKETS)
+            kind, help_text, buckets = self._meta.get(name, default)
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, labels), count in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {count}")
+            for (metric, labels), (bucket_counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(buckets, bucket_counts):
+                    le = labels + (('le', _number(bound)),)
+                    lines.append(f"{name}_bucket{_labels(le)} {bucket_count}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {total}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = Metrics()
+metrics.describe('dashboard_callback_duration_seconds', 'histogram',
+                 'Dash callback latency')
+metrics.describe('dashboard_callback_errors_total', 'counter',
+                 'Dash callbacks that raised')
+metrics.describe('dashboard_callback_request_bytes', 'histogram',
+                 'Dash callback request payload size', SIZE_BUCKETS)
+metrics.describe('dashboard_callback_response_bytes', 'histogram',
+                 'Dash callback response payload size', SIZE_BUCKETS)
+metrics.describe('dashboard_dataset_load_seconds', 'histogram',
+                 'Time to load a dataset from disk')
+metrics.describe('dashboard_figure_build_seconds', 'histogram',
+                 'Time to build and serialize a figure')
+metrics.describe('dashboard_figure_cache_requests_total', 'counter',
+                 'Figure cache lookups by result (hit or miss)')
+
+
+@contextmanager
+def timer(metric, **labels):
+    """Observe the wall time of the enclosed block in a histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(metric, time.perf_counter() - start, **labels)
+
+
+def instrument_callback(name):
+    """Decorator recording latency, errors and a log line for a Dash callback"""
+    logger = get_logger('callbacks')
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                metrics.inc('dashboard_callback_errors_total', callback=name)
+                logger.exception("Callback failed", extra={'fields': {'callback': name}})
+                raise
+            finally:
+                duration = time.perf_counter() - start
+                metrics.observe('dashboard_callback_duration_seconds', duration, callback=name)
+                logger.info("Callback finished", extra={'fields': {
+                    'callback': name, 'duration_ms': round(duration * 1000, 2)}})
+        return wrapper
+    return decorator
+
+
+def register_metrics(server, path='/metrics'):
+    """
+    Add the metrics route to a Flask server and record request/response
+    payload sizes of Dash callback requests, labelled by callback output
+    """
+    from flask import Response, request
+
+    @server.after_request
+    def record_payload_sizes(response):
+        if request.path == DASH_UPDATE_PATH:
+            body = request.get_json(silent=True) or {}
+            output = str(body.get('output', 'unknown'))
+            metrics.observe('dashboard_callback_request_bytes',
+                            request.content_length or 0, output=output)
+            if not response.is_streamed:
+                metrics.observe('dashboard_callback_response_bytes',
+                                response.calculate_content_length() or 0, output=output)
+        return response
+
+    def metrics_view():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    server.add_url_rule(path, 'metrics', metrics_view)
+    return server
+
+
+class StructuredFormatter(logging.Formatter):
+    """logfmt or JSON log lines with extra fields from record.fields"""
+
+    def __init__(self, json_lines=False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record):
+        fields = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) +
+                  f'.{int(record.msecs):03d}Z',
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        fields.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            fields['exc'] = self.formatException(record.exc_info)
+
+        if self.json_lines:
+            return json.dumps(fields, default=str)
+        return ' '.join(f"{key}={_logfmt(value)}" for key, value in fields.items())
+
+
+def _logfmt(value):
+    value = str(value)
+    if not value or any(c in value for c in ' ="\n'):
+        return json.dumps(value)
+    return value
+
+
+_configured = False
+
+
+def configure_logging(level=None):
+    """Install the structured formatter on the root logger (once per process)"""
+    global _configured
+    if _configured:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(StructuredFormatter(
+        json_lines=os.environ.get('CLIMATE_LOG_FORMAT', 'logfmt') == 'json'))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level or os.environ.get('CLIMATE_LOG_LEVEL', 'INFO').upper())
+    _configured = True
+
+
+def get_logger(name):
+    return logging.getLogger(f"climate.{name}")
@@ -1,301 +1,526 @@
-print("Starting minimal application...")
+import os
 
 import dash
 from dash import html, dcc
-from dash.dependencies import Input, Output, State
-import pandas as pd
-import plotly.express as px
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
 from datetime import datetime
 
-# Initialize the app with Bootstrap theme
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
-
-# Define the layout with Bootstrap components
-app.layout = dbc.Container([
-    # Interval component for triggering initial load
-    dcc.Interval(
-        id='interval-component',
-        interval=1*1000,
-        n_intervals=0,
-        max_intervals=1
-    ),
+import data_store
+from aggregates import period_dates
+from api import register_api
+from compression import register_compression
+import forecasting
+import refresh
+import rendering
+from figure_cache import figure_cache
+from instrumentation import configure_logging, get_logger, instrument_callback, register_metrics
+from startup import phase, register_health
+
+configure_logging()
+logger = get_logger('minimal_app')
+logger.info("Starting minimal application")
+
+# Default control values, shared by the layout and the figure prewarming
+DEFAULT_TEMPERATURE_YEARS = [1880, 2024]
+DEFAULT_COUNTRIES = ['United States', 'China', 'India', 'Russia', 'Japan']
+DEFAULT_EMISSIONS_YEARS = [1950, 2024]
+DEFAULT_WEATHER_YEARS = [1950, 2024]
+
+# Where year-range and selection filtering runs: 'server' (patched figures
+# from server callbacks) or 'client' (base figures sent once and filtered by
+# assets/filtering.js; the server only rebuilds them for new model settings)
+FILTERING_MODE = os.environ.get('CLIMATE_FILTERING', 'server')
+
+# Year slider bounds. Figures carry data for at least this span, so moving a
+# slider within it only patches the x-axis range of the graph.
+TEMPERATURE_YEAR_BOUNDS = [1880, 2024]
+EMISSIONS_YEAR_BOUNDS = [1950, 2024]
+WEATHER_YEAR_BOUNDS = [1950, 2024]
+
+def build_layout():
+    """Dashboard layout with Bootstrap components"""
+    return dbc.Container([
+        # Interval component for triggering initial load
+        dcc.Interval(
+            id='interval-component',
+            interval=1*1000,
+            n_intervals=0,
+            max_intervals=1
+        ),
+        # Browser width, used to size server-side downsampling
+        dcc.Store(id='viewport-width'),
+        # Traces currently drawn in each graph, for incremental updates
+        dcc.Store(id='emissions-traces'),
+        dcc.Store(id='weather-traces'),
+        # Unfiltered base figures for clientside filtering
+        dcc.Store(id='temperature-base'),
+        dcc.Store(id='emissions-base'),
+        dcc.Store(id='weather-base'),
     
-    # Store components for holding data
-    dcc.Store(id='temperature-data-store'),
-    dcc.Store(id='emissions-data-store'),
-    dcc.Store(id='weather-data-store'),
+        # Header
+        dbc.Row([
+            dbc.Col([
+                html.H1("Climate Change Impact Dashboard",
+                       className="text-center text-primary mb-4")
+            ])
+        ]),
     
-    # Header
-    dbc.Row([
-        dbc.Col([
-            html.H1("Climate Change Impact Dashboard",
-                   className="text-center text-primary mb-4")
-        ])
-    ]),
-    
-    # Temperature Trends
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Global Temperature Trends"),
-                dbc.CardBody([
-                    html.P("This graph shows the historical temperature trends and future predictions."),
-                    dbc.Row([
-                        dbc.Col([
-                            html.Label("Select Date Range:"),
-                            dcc.RangeSlider(
-                                id='temperature-year-slider',
-                                min=1880,
-                                max=2024,
-                                value=[1880, 2024],
-                                marks={
-                                    1880: '1880',
-                                    1920: '1920',
-                                    1960: '1960',
-                                    2000: '2000',
-                                    2024: '2024'
-                                }
+        # Temperature Trends
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Global Temperature Trends"),
+                    dbc.CardBody([
+                        html.P("This graph shows the historical temperature trends and future predictions."),
+                        dbc.Row([
+                            dbc.Col([
+                                html.Label("Select Date Range:"),
+                                dcc.RangeSlider(
+                                    id='temperature-year-slider',
+                                    min=TEMPERATURE_YEAR_BOUNDS[0],
+                                    max=TEMPERATURE_YEAR_BOUNDS[1],
+                                    value=DEFAULT_TEMPERATURE_YEARS,
+                                    marks={
+                                        1880: '1880',
+                                        1920: '1920',
+                                        1960: '1960',
+                                        2000: '2000',
+                                        2024: '2024'
+                                    }
+                                )
+                            ], width=6),
+                            dbc.Col([
+                                html.Label("Prediction Model:"),
+                                dcc.Dropdown(
+                                    id='temperature-model-selector',
+                                    options=[{'label': model.label, 'value': kind}
+                                             for kind, model in forecasting.MODEL_TYPES.items()],
+                                    value='linear',
+                                    clearable=False
+                                )
+                            ], width=3),
+                            dbc.Col([
+                                html.Label("Prediction Horizon (years):"),
+                                dcc.Slider(
+                                    id='temperature-horizon-slider',
+                                    min=10,
+                                    max=100,
+                                    step=10,
+                                    value=forecasting.DEFAULT_HORIZON,
+                                    marks={10: '10', 50: '50', 100: '100'}
+                                )
+                            ], width=3)
+                        ], className="mb-3"),
+                        dcc.Loading(
+                            id="loading-temperature",
+                            type="default",
+                            children=dcc.Graph(
+                                id='temperature-graph',
+                                style={'height': '400px'}
                             )
-                        ])
-                    ], className="mb-3"),
-                    dcc.Loading(
-                        id="loading-temperature",
-                        type="default",
-                        children=dcc.Graph(
-                            id='temperature-graph',
-                            style={'height': '400px'}
                         )
-                    )
-                ])
-            ], className="mb-4")
-        ])
-    ]),
+                    ])
+                ], className="mb-4")
+            ])
+        ]),
     
-    # CO2 Emissions
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("CO2 Emissions by Major Countries"),
-                dbc.CardBody([
-                    html.P("This graph shows CO2 emissions trends for major countries over time."),
-                    dbc.Row([
-                        dbc.Col([
-                            html.Label("Select Countries:"),
-                            dcc.Dropdown(
-                                id='country-selector',
-                                multi=True,
-                                value=['United States', 'China', 'India', 'Russian Federation', 'Japan'],
-                                placeholder="Select countries to display"
-                            )
-                        ], width=6),
-                        dbc.Col([
-                            html.Label("Select Year Range:"),
-                            dcc.RangeSlider(
-                                id='emissions-year-slider',
-                                min=1950,
-                                max=2024,
-                                value=[1950, 2024],
-                                marks={
-                                    1950: '1950',
-                                    1970: '1970',
-                                    1990: '1990',
-                                    2010: '2010',
-                                    2024: '2024'
-                                }
+        # CO2 Emissions
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("CO2 Emissions by Major Countries"),
+                    dbc.CardBody([
+                        html.P("This graph shows CO2 emissions trends for major countries over time."),
+                        dbc.Row([
+                            dbc.Col([
+                                html.Label("Select Countries:"),
+                                dcc.Dropdown(
+                                    id='country-selector',
+                                    multi=True,
+                                    value=DEFAULT_COUNTRIES,
+                                    placeholder="Select countries to display"
+                                )
+                            ], width=6),
+                            dbc.Col([
+                                html.Label("Select Year Range:"),
+                                dcc.RangeSlider(
+                                    id='emissions-year-slider',
+                                    min=EMISSIONS_YEAR_BOUNDS[0],
+                                    max=EMISSIONS_YEAR_BOUNDS[1],
+                                    value=DEFAULT_EMISSIONS_YEARS,
+                                    marks={
+                                        1950: '1950',
+                                        1970: '1970',
+                                        1990: '1990',
+                                        2010: '2010',
+                                        2024: '2024'
+                                    }
+                                )
+                            ], width=6)
+                        ], className="mb-3"),
+                        dcc.Loading(
+                            id="loading-emissions",
+                            type="default",
+                            children=dcc.Graph(
+                                id='emissions-graph',
+                                style={'height': '400px'}
                             )
-                        ], width=6)
-                    ], className="mb-3"),
-                    dcc.Loading(
-                        id="loading-emissions",
-                        type="default",
-                        children=dcc.Graph(
-                            id='emissions-graph',
-                            style={'height': '400px'}
                         )
-                    )
-                ])
-            ], className="mb-4")
-        ])
-    ]),
+                    ])
+                ], className="mb-4")
+            ])
+        ]),
     
-    # Weather Events
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Extreme Weather Events"),
-                dbc.CardBody([
-                    html.P("This graph shows the frequency of different types of extreme weather events over time."),
-                    dbc.Row([
-                        dbc.Col([
-                            html.Label("Select Event Types:"),
-                            dcc.Dropdown(
-                                id='event-type-selector',
-                                multi=True,
-                                placeholder="Select event types to display"
-                            )
-                        ], width=6),
-                        dbc.Col([
-                            html.Label("Select Year Range:"),
-                            dcc.RangeSlider(
-                                id='weather-year-slider',
-                                min=1950,
-                                max=2024,
-                                value=[1950, 2024],
-                                marks={
-                                    1950: '1950',
-                                    1970: '1970',
-                                    1990: '1990',
-                                    2010: '2010',
-                                    2024: '2024'
-                                }
+        # Weather Events
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Extreme Weather Events"),
+                    dbc.CardBody([
+                        html.P("This graph shows the frequency of different types of extreme weather events over time."),
+                        dbc.Row([
+                            dbc.Col([
+                                html.Label("Select Event Types:"),
+                                dcc.Dropdown(
+                                    id='event-type-selector',
+                                    multi=True,
+                                    placeholder="Select event types to display"
+                                )
+                            ], width=6),
+                            dbc.Col([
+                                html.Label("Select Year Range:"),
+                                dcc.RangeSlider(
+                                    id='weather-year-slider',
+                                    min=WEATHER_YEAR_BOUNDS[0],
+                                    max=WEATHER_YEAR_BOUNDS[1],
+                                    value=DEFAULT_WEATHER_YEARS,
+                                    marks={
+                                        1950: '1950',
+                                        1970: '1970',
+                                        1990: '1990',
+                                        2010: '2010',
+                                        2024: '2024'
+                                    }
+                                )
+                            ], width=6)
+                        ], className="mb-3"),
+                        dcc.Loading(
+                            id="loading-weather",
+                            type="default",
+                            children=dcc.Graph(
+                                id='weather-graph',
+                                style={'height': '400px'}
                             )
-                        ], width=6)
-                    ], className="mb-3"),
-                    dcc.Loading(
-                        id="loading-weather",
-                        type="default",
-                        children=dcc.Graph(
-                            id='weather-graph',
-                            style={'height': '400px'}
                         )
-                    )
-                ])
-            ], className="mb-4")
+                    ])
+                ], className="mb-4")
+            ])
         ])
-    ])
-], fluid=True, className="p-4")
-
-# Callback to load initial data
-@app.callback(
-    [Output('temperature-data-store', 'data'),
-     Output('emissions-data-store', 'data'),
-     Output('weather-data-store', 'data'),
-     Output('country-selector', 'options'),
-     Output('event-type-selector', 'options'),
-     Output('event-type-selector', 'value')],
-    Input('interval-component', 'n_intervals')
-)
+    ], fluid=True, className="p-4")
+
+# Callback to populate the selectors; the tables themselves stay on the server
+@instrument_callback('load_data')
 def load_data(_):
-    print("Loading initial data...")
-    # Load temperature data
-    temp_df = pd.read_csv('data/temperature_data.csv')
-    
-    # Load emissions data
-    emissions_df = pd.read_csv('data/emissions_data.csv')
-    countries = sorted(emissions_df['country'].unique())
+    countries = data_store.country_options()
     country_options = [{'label': country, 'value': country} for country in countries]
     
-    # Load weather data
-    weather_df = pd.read_csv('data/weather_events.csv')
-    event_types = sorted(weather_df['Event_Type'].unique())
+    event_types = data_store.event_types()
     event_options = [{'label': event, 'value': event} for event in event_types]
     
-    return (temp_df.to_dict('records'), 
-            emissions_df.to_dict('records'),
-            weather_df.to_dict('records'),
-            country_options,
+    return (country_options,
             event_options,
             event_types)  # Select all event types by default
 
-@app.callback(
-    Output('temperature-graph', 'figure'),
-    [Input('temperature-data-store', 'data'),
-     Input('temperature-year-slider', 'value')]
-)
-def update_temperature_graph(data, years):
-    print("Updating temperature graph...")
-    if not data:
-        return {}
+@figure_cache.memoize('temperature')
+def temperature_figure(years, model='linear', horizon=forecasting.DEFAULT_HORIZON, x_range=None,
+                       max_points=None):
+    # The finest resolution that suits the visible span: the zoom window or the slider range
+    span = rendering.year_span(x_range) if x_range else years[1] - years[0]
+    resolution = data_store.resolution_for_span(span)
+    window = years
+    if x_range:
+        # Only the zoomed years, and one more either side for the points beyond the edges
+        start, end = rendering.year_bounds(x_range)
+        window = [max(years[0], start - 1), min(years[1], end + 1)]
+    df = data_store.filter_temperature_at(resolution, window)
     
-    df = pd.DataFrame(data)
-    df = df[(df['Year'] >= years[0]) & (df['Year'] <= years[1])]
+    series = []
+    if not df.empty:
+        series.append(('Historical', *rendering.visible_points(df['Date'], df['Temperature'],
+                                                               x_range, max_points)))
     
-    fig = px.line(df, x='Year', y='Temperature', color='Type',
-                  title=f'Global Temperature Trends ({years[0]}-{years[1]})')
+    # Predictions continue the record, so show them once the range reaches its end
+    history = data_store.temperature_history()
+    last_year = int(history['Year'].max())
+    if model and horizon and years[1] >= last_year:
+        predictions = forecasting.forecast(history['Year'], history['Temperature'],
+                                           kind=model, horizon=horizon)
+        series.append(('Prediction', *rendering.visible_points(
+            period_dates(predictions['Year'], 7), predictions['Temperature'], x_range, max_points)))
+    if not series:
+        return {}
+    
+    webgl = rendering.use_webgl(sum(len(x) for _, x, _ in series))
+    fig = go.Figure([rendering.line_trace(x, y, name, webgl) for name, x, y in series])
     fig.update_layout(
-        xaxis_title="Year",
+        title=f'Global Temperature Trends ({years[0]}-{years[1]})',
+        xaxis_title=f"Year ({resolution} means)",
         yaxis_title="Temperature (°C)",
         showlegend=True
     )
+    if x_range:
+        fig.update_xaxes(range=x_range)
+        fig.update_yaxes(range=rendering.y_range(series, x_range))
+    # Lets clientside filtering show the forecast under the same rule
+    fig.update_traces(meta={'show_from': last_year}, selector={'name': 'Prediction'})
     return fig
 
-@app.callback(
-    Output('emissions-graph', 'figure'),
-    [Input('emissions-data-store', 'data'),
-     Input('country-selector', 'value'),
-     Input('emissions-year-slider', 'value')]
-)
-def update_emissions_graph(data, selected_countries, years):
-    print("Updating emissions graph...")
-    if not data or not selected_countries:
+@instrument_callback('update_temperature_graph')
+def update_temperature_graph(years, model='linear', horizon=forecasting.DEFAULT_HORIZON,
+                             relayout_data=None, width=None):
+    x_range = rendering.triggered_zoom('temperature-graph', relayout_data)
+    return temperature_figure(years, model, horizon, x_range, rendering.point_budget(width))
+
+def year_domain(years, bounds):
+    """Years a figure loads data for: the slider bounds, widened to the selection"""
+    return [min(years[0], bounds[0]), max(years[1], bounds[1])]
+
+def emissions_series(countries, domain, x_range=None, max_points=None):
+    return [(country, *rendering.visible_points(years, co2, x_range, max_points))
+            for country, years, co2 in data_store.country_series(countries, domain)]
+
+def emissions_title(years):
+    return f'CO2 Emissions by Country ({years[0]}-{years[1]})'
+
+@figure_cache.memoize('emissions')
+def emissions_figure(selected_countries, years, x_range=None, max_points=None):
+    if not selected_countries:
         return {}
     
-    df = pd.DataFrame(data)
-    df = df[(df['year'] >= years[0]) & (df['year'] <= years[1])]
+    series = emissions_series(selected_countries, year_domain(years, EMISSIONS_YEAR_BOUNDS),
+                              x_range, max_points)
     
-    fig = go.Figure()
-    for country in selected_countries:
-        country_data = df[df['country'] == country]
-        if not country_data.empty:
-            fig.add_trace(
-                go.Scatter(
-                    x=country_data['year'],
-                    y=country_data['co2'],
-                    name=country,
-                    mode='lines+markers'
-                )
-            )
+    webgl = rendering.use_webgl(sum(len(x) for _, x, _ in series))
+    fig = go.Figure([rendering.line_trace(x, y, country, webgl) for country, x, y in series])
+    fig.update_xaxes(range=x_range or years)
+    fig.update_yaxes(range=rendering.y_range(series, x_range or years))
     
     fig.update_layout(
-        title=f'CO2 Emissions by Country ({years[0]}-{years[1]})',
+        title=emissions_title(years),
         xaxis_title='Year',
         yaxis_title='CO2 Emissions (million tonnes)',
         showlegend=True
     )
     return fig
 
-@app.callback(
-    Output('weather-graph', 'figure'),
-    [Input('weather-data-store', 'data'),
-     Input('event-type-selector', 'value'),
-     Input('weather-year-slider', 'value')]
-)
-def update_weather_graph(data, selected_events, years):
-    print("Updating weather graph...")
-    if not data or not selected_events:
-        return {}
+@instrument_callback('update_emissions_graph')
+def update_emissions_graph(selected_countries, years, relayout_data=None, width=None, shown=None):
+    x_range = rendering.triggered_zoom('emissions-graph', relayout_data)
+    max_points = rendering.point_budget(width)
+    if x_range is None:
+        update = rendering.patch_figure(
+            shown, selected_countries, years, emissions_title(years),
+            lambda countries: emissions_series(countries, shown['domain'], None, max_points))
+        if update is not None:
+            return update
     
-    df = pd.DataFrame(data)
-    df = df[(df['Year'] >= years[0]) & (df['Year'] <= years[1])]
+    fig = emissions_figure(selected_countries, years, x_range, max_points)
+    return fig, rendering.figure_state(fig, year_domain(years, EMISSIONS_YEAR_BOUNDS),
+                                       zoomed=x_range is not None)
+
+def weather_series(event_types, domain, x_range=None, max_points=None):
+    counts = data_store.weather_counts(event_types, domain)
+    return [(event, *rendering.visible_points(counts.index, counts[event], x_range, max_points))
+            for event in counts.columns]
+
+def weather_title(years):
+    return f'Weather Events Over Time ({years[0]}-{years[1]})'
+
+@figure_cache.memoize('weather')
+def weather_figure(selected_events, years, x_range=None, max_points=None):
+    if not selected_events:
+        return {}
     
-    fig = go.Figure()
-    for event in selected_events:
-        event_data = df[df['Event_Type'] == event]
-        if not event_data.empty:
-            fig.add_trace(
-                go.Scatter(
-                    x=event_data['Year'],
-                    y=event_data['Count'],
-                    name=event,
-                    mode='lines+markers'
-                )
-            )
+    series = weather_series(selected_events, year_domain(years, WEATHER_YEAR_BOUNDS),
+                            x_range, max_points)
+    webgl = rendering.use_webgl(sum(len(x) for _, x, _ in series))
+    fig = go.Figure([rendering.line_trace(x, y, event, webgl) for event, x, y in series])
+    fig.update_xaxes(range=x_range or years)
+    fig.update_yaxes(range=rendering.y_range(series, x_range or years))
     
     fig.update_layout(
-        title=f'Weather Events Over Time ({years[0]}-{years[1]})',
+        title=weather_title(years),
         xaxis_title='Year',
         yaxis_title='Number of Events',
         showlegend=True
     )
     return fig
 
+@instrument_callback('update_weather_graph')
+def update_weather_graph(selected_events, years, relayout_data=None, width=None, shown=None):
+    x_range = rendering.triggered_zoom('weather-graph', relayout_data)
+    max_points = rendering.point_budget(width)
+    if x_range is None:
+        update = rendering.patch_figure(
+            shown, selected_events, years, weather_title(years),
+            lambda events: weather_series(events, shown['domain'], None, max_points))
+        if update is not None:
+            return update
+    
+    fig = weather_figure(selected_events, years, x_range, max_points)
+    return fig, rendering.figure_state(fig, year_domain(years, WEATHER_YEAR_BOUNDS),
+                                       zoomed=x_range is not None)
+
+@instrument_callback('temperature_base')
+def temperature_base(model='linear', horizon=forecasting.DEFAULT_HORIZON):
+    """Temperature figure over the whole slider span, for clientside filtering"""
+    return temperature_figure(TEMPERATURE_YEAR_BOUNDS, model, horizon, None, rendering.point_budget())
+
+@instrument_callback('emissions_base')
+def emissions_base(width=None):
+    """Emissions figure with every country over the slider span"""
+    return emissions_figure(data_store.country_options(), EMISSIONS_YEAR_BOUNDS,
+                            None, rendering.point_budget(width))
+
+@instrument_callback('weather_base')
+def weather_base(width=None):
+    """Weather figure with every event type over the slider span"""
+    return weather_figure(data_store.event_types(), WEATHER_YEAR_BOUNDS,
+                          None, rendering.point_budget(width))
+
+def register_clientside_filtering(app):
+    """
+    Callbacks for CLIMATE_FILTERING=client: the server fills the base figure
+    stores, assets/filtering.js derives the displayed figures from them
+    """
+    app.callback(
+        Output('temperature-base', 'data'),
+        [Input('temperature-model-selector', 'value'),
+         Input('temperature-horizon-slider', 'value')]
+    )(temperature_base)
+    app.callback(
+        Output('emissions-base', 'data'),
+        Input('viewport-width', 'data')
+    )(emissions_base)
+    app.callback(
+        Output('weather-base', 'data'),
+        Input('viewport-width', 'data')
+    )(weather_base)
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='filtering', function_name='yearRange'),
+        Output('temperature-graph', 'figure'),
+        [Input('temperature-year-slider', 'value'),
+         Input('temperature-base', 'data')]
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='filtering', function_name='selectTraces'),
+        Output('emissions-graph', 'figure'),
+        [Input('country-selector', 'value'),
+         Input('emissions-year-slider', 'value'),
+         Input('emissions-base', 'data')]
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='filtering', function_name='selectTraces'),
+        Output('weather-graph', 'figure'),
+        [Input('event-type-selector', 'value'),
+         Input('weather-year-slider', 'value'),
+         Input('weather-base', 'data')]
+    )
+
+def register_callbacks(app, filtering=None):
+    """Attach the dashboard callbacks to a Dash app"""
+    app.callback(
+        [Output('country-selector', 'options'),
+         Output('event-type-selector', 'options'),
+         Output('event-type-selector', 'value')],
+        Input('interval-component', 'n_intervals')
+    )(load_data)
+
+    if (filtering or FILTERING_MODE) == 'client':
+        register_clientside_filtering(app)
+    else:
+        app.callback(
+            Output('temperature-graph', 'figure'),
+            [Input('temperature-year-slider', 'value'),
+             Input('temperature-model-selector', 'value'),
+             Input('temperature-horizon-slider', 'value'),
+             Input('temperature-graph', 'relayoutData')],
+            State('viewport-width', 'data')
+        )(update_temperature_graph)
+
+        app.callback(
+            [Output('emissions-graph', 'figure'),
+             Output('emissions-traces', 'data')],
+            [Input('country-selector', 'value'),
+             Input('emissions-year-slider', 'value'),
+             Input('emissions-graph', 'relayoutData')],
+            [State('viewport-width', 'data'),
+             State('emissions-traces', 'data')]
+        )(update_emissions_graph)
+
+        app.callback(
+            [Output('weather-graph', 'figure'),
+             Output('weather-traces', 'data')],
+            [Input('event-type-selector', 'value'),
+             Input('weather-year-slider', 'value'),
+             Input('weather-graph', 'relayoutData')],
+            [State('viewport-width', 'data'),
+             State('weather-traces', 'data')]
+        )(update_weather_graph)
+
+    app.clientside_callback(
+        "function(n) { return window.innerWidth; }",
+        Output('viewport-width', 'data'),
+        Input('interval-component', 'n_intervals')
+    )
+
+def preload():
+    """
+    Load the datasets and build the default figures ahead of the first
+    request. wsgi.py runs it as the startup warm-up: in the gunicorn master
+    with preload_app (CLIMATE_STARTUP=preload) so workers inherit both
+    copy-on-write, or on a background thread in each worker.
+    """
+    with phase('load datasets'):
+        data_store.registry.preload()
+    with phase('build default figures'):
+        if FILTERING_MODE == 'client':
+            figure_cache.pin(temperature_figure, TEMPERATURE_YEAR_BOUNDS,
+                             'linear', forecasting.DEFAULT_HORIZON, None, rendering.point_budget())
+            figure_cache.pin(emissions_figure, data_store.country_options(),
+                             EMISSIONS_YEAR_BOUNDS, None, rendering.point_budget())
+            figure_cache.pin(weather_figure, data_store.event_types(),
+                             WEATHER_YEAR_BOUNDS, None, rendering.point_budget())
+        else:
+            figure_cache.pin(temperature_figure, DEFAULT_TEMPERATURE_YEARS,
+                             'linear', forecasting.DEFAULT_HORIZON, None, rendering.point_budget())
+            figure_cache.pin(emissions_figure, DEFAULT_COUNTRIES, DEFAULT_EMISSIONS_YEARS,
+                             None, rendering.point_budget())
+            figure_cache.pin(weather_figure, data_store.event_types(), DEFAULT_WEATHER_YEARS,
+                             None, rendering.point_budget())
+
+def create_app(ready=None):
+    """
+    Build the Dash app (WSGI application: create_app().server). `ready`
+    reports to /healthz whether the warm-up has finished.
+    """
+    app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    app.layout = build_layout()
+    register_callbacks(app)
+    register_metrics(app.server)
+    register_api(app.server)
+    register_compression(app.server)
+    register_health(app.server, ready)
+    return app
+
 if __name__ == '__main__':
-    print("\nStarting server on port 8501...")
-    print("Dashboard will be available at: http://localhost:8501")
-    print("Press Ctrl+C to quit\n")
+    logger.info("Starting server", extra={'fields': {'url': 'http://localhost:8501'}})
     
+    app = create_app()
+    refresh.start_scheduler()
     app.run_server(
         debug=True,
         port=8501,
@@ -0,0 +1,51 @@
+"""
+Small dependency-aware stage runner used by data_processor.
+
+Stages whose dependencies are satisfied run concurrently on a thread
+pool; each stage receives the results of its dependencies as keyword
+arguments, so a frame fetched once can be reused by every dependent step.
+"""
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+Stage = namedtuple('Stage', ['func', 'deps'])
+Stage.__new__.__defaults__ = ((),)
+
+
+def _timed(func, kwargs):
+    start = time.perf_counter()
+    result = func(**kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_pipeline(stages, max_workers=4):
+    """
+    Run a {name: Stage} mapping and return (results, timings), where
+    timings holds the wall time of each stage in seconds
+    """
+    for name, stage in stages.items():
+        missing = [dep for dep in stage.deps if dep not in stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stages: {missing}")
+
+    results = {}
+    timings = {}
+    pending = dict(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if all(dep in results for dep in stage.deps):
+                    kwargs = {dep: results[dep] for dep in stage.deps}
+                    running[pool.submit(_timed, stage.func, kwargs)] = name
+                    del pending[name]
+
+            if not running:
+                raise ValueError(f"Circular dependencies between stages: {sorted(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name], timings[name] = future.result()
+    return results, timings
@@ -0,0 +1,326 @@
+"""
+Scheduled dataset refresh with an atomic swap into the running apps.
+
+A refresh runs data_processor.process_and_save_data into a staging
+directory seeded with the live datasets (so sources whose upstream file is
+unchanged keep their output), validates the result and publishes it as a
+new immutable release under data/releases. The data/current symlink is
+then replaced in a single rename. Every process reading through
+data_store.registry picks up the new release on its next version check and
+reloads its frames; requests in flight keep reading the previous release,
+which stays on disk until it is pruned. When no dataset file changed
+(every upstream answered 304 and the demo weather events already exist),
+nothing is published and the current release is marked as checked.
+
+Upstream fetches follow the resilience retry policy within one
+REFRESH_DEADLINE per refresh. A source that cannot be fetched keeps its
+dataset from the live release (the staging copy), so a refresh during an
+upstream outage republishes the last known good data rather than failing
+or stalling.
+
+Run it as a sidecar:
+
+    python refresh.py                 # every CLIMATE_REFRESH_INTERVAL seconds
+    python refresh.py --once --force  # one refresh now
+
+or in-process, where start_scheduler() is called by gunicorn.conf.py (in
+each worker) and minimal_app.py when CLIMATE_REFRESH_INTERVAL is set. An
+exclusive lock file and the age of the current release keep concurrent
+schedulers from refreshing more than once per interval.
+"""
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+import data_processor
+import database
+from resilience import Deadline
+from data_store import (CURRENT_LINK, DATA_DIR, DATASET_DTYPES, DATASET_FILES, DERIVED_DATASETS,
+                        RELEASES_DIR, columnar_path, read_dataset)
+from instrumentation import get_logger, metrics, timer
+
+logger = get_logger('refresh')
+
+# Seconds between refreshes; 0 disables the scheduler
+REFRESH_INTERVAL = float(os.environ.get('CLIMATE_REFRESH_INTERVAL', 0))
+
+# Releases kept on disk, including the live one
+KEEP_RELEASES = int(os.environ.get('CLIMATE_KEEP_RELEASES', 3))
+
+# A new dataset with fewer rows than this fraction of the live one is rejected
+MIN_ROW_RATIO = 0.5
+
+LOCK_FILE = 'refresh.lock'
+
+metrics.describe('dashboard_refresh_total', 'counter',
+                 'Dataset refreshes by outcome (published, unchanged, invalid, failed, skipped)')
+metrics.describe('dashboard_refresh_duration_seconds', 'histogram',
+                 'Time to fetch, process, validate and publish a release')
+
+
+@contextmanager
+def _exclusive(data_dir):
+    """Yield True if this process holds the refresh lock for data_dir"""
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, LOCK_FILE), 'w') as lock_file:
+        try:
+            import fcntl
+        except ImportError:
+            # No advisory locks on this platform; rely on the due check
+            yield True
+            return
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def live_dir(data_dir=DATA_DIR):
+    """Directory of the live datasets: the current release or data_dir itself"""
+    current = os.path.join(data_dir, CURRENT_LINK)
+    return os.path.realpath(current) if os.path.isdir(current) else data_dir
+
+
+def release_age(data_dir=DATA_DIR):
+    """
+    Seconds since the current release was published or last found
+    unchanged, or None if there is none
+    """
+    try:
+        return time.time() - os.lstat(os.path.join(data_dir, CURRENT_LINK)).st_mtime
+    except OSError:
+        return None
+
+
+def seed_staging(data_dir=DATA_DIR):
+    """New staging directory holding copies of the live dataset files and database"""
+    releases = os.path.join(data_dir, RELEASES_DIR)
+    os.makedirs(releases, exist_ok=True)
+    staging = os.path.join(releases, f".staging-{os.getpid()}-{int(time.time())}")
+    os.makedirs(staging)
+
+    source = live_dir(data_dir)
+    paths = [os.path.join(source, database.DATABASE_FILE)]
+    for filename in DATASET_FILES.values():
+        paths += [os.path.join(source, filename), columnar_path(os.path.join(source, filename))]
+    for path in paths:
+        if os.path.exists(path):
+            # copy2 keeps mtimes, which decide whether an output is current
+            shutil.copy2(path, staging)
+    return staging
+
+
+def changed_files(staging_dir, previous_dir):
+    """
+    Files of a staging directory that differ from the live release's. The
+    seeded copies keep their size and mtime until a stage rewrites them.
+    """
+    changed = []
+    for filename in sorted(os.listdir(staging_dir)):
+        staged = os.stat(os.path.join(staging_dir, filename))
+        try:
+            live = os.stat(os.path.join(previous_dir, filename))
+        except OSError:
+            changed.append(filename)
+            continue
+        if (staged.st_size, staged.st_mtime_ns) != (live.st_size, live.st_mtime_ns):
+            changed.append(filename)
+    return changed
+
+
+def validate_release(release_dir, previous_dir=None):
+    """
+    Problems found in a staged release (an empty list when it is usable):
+    missing or unreadable datasets, missing columns, empty tables, value
+    columns without data and tables that shrank sharply against the
+    previous release
+    """
+    problems = []
+    for name, filename in DATASET_FILES.items():
+        path = os.path.join(release_dir, filename)
+        if not (os.path.exists(path) or os.path.exists(columnar_path(path))):
+            if name not in DERIVED_DATASETS:
+                problems.append(f"{name}: missing")
+            continue
+        try:
+            df = read_dataset(path, name)
+        except Exception as e:
+            problems.append(f"{name}: unreadable ({e})")
+            continue
+
+        missing = [column for column in DATASET_DTYPES.get(name, {}) if column not in df.columns]
+        if missing:
+            problems.append(f"{name}: missing columns {missing}")
+        if df.empty:
+            problems.append(f"{name}: no rows")
+            continue
+        empty = [column for column in df.select_dtypes('number').columns if df[column].isna().all()]
+        if empty:
+            problems.append(f"{name}: no values in {empty}")
+
+        previous_path = os.path.join(previous_dir, filename) if previous_dir else None
+        if previous_path and (os.path.exists(previous_path) or
+                              os.path.exists(columnar_path(previous_path))):
+            previous_rows = len(read_dataset(previous_path, name))
+            if len(df) < previous_rows * MIN_ROW_RATIO:
+                problems.append(f"{name}: {len(df)} rows, down from {previous_rows}")
+    return problems
+
+
+def publish(staging_dir, data_dir=DATA_DIR, keep=KEEP_RELEASES):
+    """
+    Move a validated staging directory into releases/ and point the
+    current link at it with an atomic rename. Returns the release path.
+    """
+    release_id = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())
+    release_dir = os.path.join(data_dir, RELEASES_DIR, release_id)
+    suffix = 1
+    while os.path.exists(release_dir):
+        release_dir = os.path.join(data_dir, RELEASES_DIR, f"{release_id}-{suffix}")
+        suffix += 1
+    os.rename(staging_dir, release_dir)
+
+    link = os.path.join(data_dir, CURRENT_LINK)
+    tmp_link = link + '.tmp'
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(os.path.relpath(release_dir, data_dir), tmp_link)
+    os.replace(tmp_link, link)
+    logger.info("Published dataset release", extra={'fields': {'release': release_dir}})
+
+    prune_releases(data_dir, keep)
+    return release_dir
+
+
+def prune_releases(data_dir=DATA_DIR, keep=KEEP_RELEASES):
+    """Delete all but the newest `keep` releases, never the live one"""
+    releases = os.path.join(data_dir, RELEASES_DIR)
+    live = live_dir(data_dir)
+    names = sorted(name for name in os.listdir(releases) if not name.startswith('.'))
+    for name in names[:-keep] if keep else []:
+        path = os.path.join(releases, name)
+        if os.path.realpath(path) != live:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def refresh(data_dir=DATA_DIR, force=False, formats=data_processor.OUTPUT_FORMATS,
+            keep=KEEP_RELEASES, max_age=None, deadline=None):
+    """
+    Fetch, process, validate and publish a new release. With max_age, skip
+    when the current release is younger than that many seconds. Fetches
+    share deadline (a resilience.Deadline, by default REFRESH_DEADLINE
+    seconds from the start). Without force, a refresh that changed no
+    dataset publishes nothing and restarts the current release's age.
+    Returns the live release directory afterwards (the new one, or the
+    current one when nothing changed), or None when the refresh was
+    skipped, invalid or failed.
+    """
+    with _exclusive(data_dir) as acquired:
+        age = release_age(data_dir)
+        if not acquired or (max_age and age is not None and age < max_age):
+            metrics.inc('dashboard_refresh_total', outcome='skipped')
+            return None
+
+        previous = live_dir(data_dir)
+        staging = seed_staging(data_dir)
+        try:
+            with timer('dashboard_refresh_duration_seconds'):
+                data_processor.process_and_save_data(formats=formats, force=force,
+                                                     data_dir=staging,
+                                                     deadline=deadline or Deadline())
+                if age is not None and not force and not changed_files(staging, previous):
+                    logger.info("No dataset changed, keeping the current release",
+                                extra={'fields': {'release': previous}})
+                    metrics.inc('dashboard_refresh_total', outcome='unchanged')
+                    shutil.rmtree(staging, ignore_errors=True)
+                    # Restarts release_age, so the scheduler waits a full interval again
+                    os.utime(os.path.join(data_dir, CURRENT_LINK), follow_symlinks=False)
+                    return previous
+                problems = validate_release(staging, previous)
+                if problems:
+                    logger.error("Refreshed data failed validation, keeping the current release",
+                                 extra={'fields': {'problems': '; '.join(problems)}})
+                    metrics.inc('dashboard_refresh_total', outcome='invalid')
+                    shutil.rmtree(staging, ignore_errors=True)
+                    return None
+                release = publish(staging, data_dir, keep)
+        except Exception:
+            logger.exception("Dataset refresh failed, keeping the current release")
+            metrics.inc('dashboard_refresh_total', outcome='failed')
+            shutil.rmtree(staging, ignore_errors=True)
+            return None
+
+    metrics.inc('dashboard_refresh_total', outcome='published')
+    return release
+
+
+class RefreshScheduler:
+    """Daemon thread calling refresh() whenever the current release is older than interval"""
+
+    def __init__(self, interval=REFRESH_INTERVAL, data_dir=DATA_DIR, poll=60.0):
+        self.interval = interval
+        self.data_dir = data_dir
+        self.poll = min(poll, interval)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Run the scheduler on a daemon thread"""
+        self._thread = threading.Thread(target=self.run, name='dataset-refresh', daemon=True)
+        self._thread.start()
+        logger.info("Refresh scheduler started", extra={'fields': {'interval_s': self.interval}})
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run(self, force=False):
+        """Refresh whenever due, checking every `poll` seconds until stopped"""
+        while True:
+            age = release_age(self.data_dir)
+            if age is None or age >= self.interval:
+                # Stopping the scheduler also cuts short any backoff wait
+                refresh(self.data_dir, force=force, max_age=self.interval,
+                        deadline=Deadline(cancel=self._stop))
+            if self._stop.wait(self.poll):
+                return
+
+
+def start_scheduler(interval=None, data_dir=DATA_DIR):
+    """Start a RefreshScheduler when an interval is configured; returns it or None"""
+    interval = REFRESH_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return None
+    return RefreshScheduler(interval, data_dir).start()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from instrumentation import configure_logging
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--once', action='store_true', help='refresh once and exit')
+    parser.add_argument('--force', action='store_true',
+                        help='reprocess sources even when upstream is unchanged')
+    parser.add_argument('--interval', type=float, default=REFRESH_INTERVAL or 6 * 3600,
+                        help='seconds between refreshes (default: %(default)s)')
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.once:
+        raise SystemExit(0 if refresh(force=args.force) else 1)
+
+    try:
+        RefreshScheduler(args.interval).run(force=args.force)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,266 @@
+"""
+Adaptive trace rendering for large time series.
+
+Series are cut to the visible x range and downsampled server-side to about
+one point per horizontal pixel of the graph, with LTTB (largest triangle
+three buckets) or min-max bucketing, both of which keep peaks and troughs
+that plain striding would drop. Figures with more points than
+WEBGL_POINT_THRESHOLD are drawn with Scattergl and without markers.
+"""
+import numpy as np
+import plotly.graph_objects as go
+
+from data_store import DISPLAY_PRECISION
+
+# Total points in a figure above which traces switch to WebGL
+WEBGL_POINT_THRESHOLD = 2000
+
+# Graph width assumed before the browser has reported one, and the bounds
+# of the per-trace point budget derived from it
+DEFAULT_WIDTH = 1200
+MIN_POINTS = 100
+MAX_POINTS = 4000
+
+DOWNSAMPLERS = ('lttb', 'minmax')
+
+
+def _numeric(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[s]').astype('int64').astype('float64')
+    return values.astype('float64')
+
+
+def point_budget(width=None):
+    """Points per trace for a graph `width` pixels wide, rounded to 100px"""
+    width = int(width or DEFAULT_WIDTH)
+    return int(min(max(round(width, -2), MIN_POINTS), MAX_POINTS))
+
+
+def lttb(x, y, n_out):
+    """Indices of the n_out points selected by largest triangle three buckets"""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x, y = _numeric(x), _numeric(y)
+    # First and last points are kept; the rest are split into n_out - 2 buckets
+    bounds = np.append(np.linspace(1, n - 1, n_out - 1).astype('int64'), n)
+    indices = np.empty(n_out, dtype='int64')
+    indices[0], indices[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = bounds[i], bounds[i + 1]
+        next_start, next_end = bounds[i + 1], bounds[i + 2]
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) -
+                      (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def minmax(x, y, n_out):
+    """Indices of the minimum and maximum of each of n_out / 2 buckets"""
+    n = len(x)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+
+    n_buckets = n_out // 2
+    buckets = np.arange(n) * n_buckets // n
+    order = np.lexsort((_numeric(y), buckets))
+    starts = np.searchsorted(buckets[order], np.arange(n_buckets))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def visible_points(x, y, x_range=None, max_points=None, method='lttb'):
+    """
+    Points of a series sorted by x to draw in a graph: missing values
+    dropped, cut to x_range (keeping one point either side so lines reach
+    the edges) and downsampled to max_points
+    """
+    if method not in DOWNSAMPLERS:
+        raise ValueError(f"Unknown downsampling method {method!r}, expected one of {DOWNSAMPLERS}")
+    x, y = np.asarray(x), np.asarray(y)
+    keep = ~np.isnan(_numeric(y))
+    if not keep.all():
+        x, y = x[keep], y[keep]
+    # Series from an IndexedSeries are already sorted and stay views
+    if len(x) > 1 and not (x[1:] >= x[:-1]).all():
+        order = np.argsort(x, kind='stable')
+        x, y = x[order], y[order]
+
+    if x_range is not None:
+        bounds = np.asarray(x_range, dtype=x.dtype) if np.issubdtype(x.dtype, np.datetime64) \
+            else np.asarray(x_range, dtype='float64')
+        lo = max(np.searchsorted(x, bounds[0], side='left') - 1, 0)
+        hi = min(np.searchsorted(x, bounds[1], side='right') + 1, len(x))
+        x, y = x[lo:hi], y[lo:hi]
+
+    max_points = max_points or point_budget()
+    if len(x) > max_points:
+        indices = lttb(x, y, max_points) if method == 'lttb' else minmax(x, y, max_points)
+        x, y = x[indices], y[indices]
+    return x, y
+
+
+def y_range(series, x_range, pad=0.05):
+    """
+    y-axis range fitting the points of (name, x, y) series inside x_range.
+    Plotly autoranges y over all loaded points, not just the visible ones,
+    so figures carrying data beyond the visible years set it explicitly.
+    Returns None when no point is visible.
+    """
+    visible = []
+    for _, x, y in series:
+        x = np.asarray(x)
+        if np.issubdtype(x.dtype, np.datetime64):
+            bounds = _numeric(np.asarray(x_range, dtype=x.dtype))
+        else:
+            bounds = np.asarray(x_range, dtype='float64')
+        x = _numeric(x)
+        visible.append(_numeric(y)[(x >= bounds[0]) & (x <= bounds[1])])
+    values = np.concatenate(visible) if visible else np.array([])
+    if not len(values):
+        return None
+    low, high = float(values.min()), float(values.max())
+    margin = (high - low) * pad or abs(high) * pad or 1.0
+    return [low - margin, high + margin]
+
+
+def display_values(values, digits=DISPLAY_PRECISION):
+    """
+    Values rounded to the display precision as float64, so they serialize
+    as short literals (float32 columns would otherwise come out with
+    spurious digits, e.g. 33.94200134277344)
+    """
+    return np.round(np.asarray(values, dtype='float64'), digits)
+
+
+def use_webgl(total_points, threshold=WEBGL_POINT_THRESHOLD):
+    return total_points > threshold
+
+
+def line_trace(x, y, name, webgl=False):
+    """Line trace with markers for small figures, WebGL lines for large ones"""
+    y = display_values(y)
+    if webgl:
+        return go.Scattergl(x=x, y=y, name=name, mode='lines')
+    return go.Scatter(x=x, y=y, name=name, mode='lines+markers')
+
+
+def zoom_range(relayout_data):
+    """
+    The x-axis range a user zoomed or panned to, from a graph's relayoutData,
+    or None for the full (autoranged) view
+    """
+    if not relayout_data or relayout_data.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        return [relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']]
+    if 'xaxis.range' in relayout_data:
+        return list(relayout_data['xaxis.range'])
+    return None
+
+
+def year_span(x_range):
+    """Length in years of an x range given in years or as dates"""
+    bounds = np.asarray(x_range)
+    if bounds.dtype.kind in 'OUSM':
+        # Day precision covers any year a zoomed-out axis can reach
+        days = bounds.astype('datetime64[D]').astype('int64')
+        return float(days[1] - days[0]) / 365.25
+    return float(np.diff(bounds.astype('float64'))[0])
+
+
+def year_bounds(x_range):
+    """First and last (whole) year of an x range given in years or as dates"""
+    bounds = np.asarray(x_range)
+    if bounds.dtype.kind in 'OUSM':
+        years = bounds.astype('datetime64[Y]').astype('int64') + 1970
+        return [int(years[0]), int(years[1])]
+    return [int(np.floor(float(bounds[0]))), int(np.ceil(float(bounds[1])))]
+
+
+def triggered_zoom(graph_id, relayout_data):
+    """
+    zoom_range() of a graph, honoured only when the graph's own relayout
+    triggered the callback, so that a new selection resets the zoom
+    """
+    from dash import callback_context
+    from dash.exceptions import MissingCallbackContextException
+
+    try:
+        triggered = callback_context.triggered_prop_ids
+    except MissingCallbackContextException:
+        # Called directly rather than as a Dash callback
+        return zoom_range(relayout_data)
+    if f"{graph_id}.relayoutData" not in triggered:
+        return None
+    return zoom_range(relayout_data)
+
+
+def figure_state(figure, domain, zoomed=False):
+    """
+    What a built figure shows, kept in a dcc.Store next to the graph so a
+    later callback can patch it: trace names and point counts, the x domain
+    the traces cover and whether they are cut to a zoom window
+    """
+    data = figure.get('data', []) if figure else []
+    return {
+        'names': [trace.get('name') for trace in data],
+        'points': [len(trace.get('x') or []) for trace in data],
+        'domain': list(domain),
+        'zoomed': zoomed
+    }
+
+
+def patch_figure(state, selected, years, title, series_for):
+    """
+    Incremental update of a line figure described by figure_state(): a
+    dash.Patch that removes deselected traces, appends traces for newly
+    selected names (built from series_for(names), a list of (name, x, y))
+    and moves the x-axis to `years`, together with the new state. Returns
+    None when the figure has to be rebuilt instead: nothing shown yet, a
+    zoomed figure, years outside the loaded domain, an empty selection or
+    a change that crosses the WebGL threshold.
+    """
+    from dash import Patch
+
+    if not state or not state['names'] or state['zoomed'] or not selected:
+        return None
+    domain = state['domain']
+    if years[0] < domain[0] or years[1] > domain[1]:
+        return None
+
+    names, points = state['names'], state['points']
+    keep = [i for i, name in enumerate(names) if name in selected]
+    added = [name for name in dict.fromkeys(selected) if name not in names]
+    # Shown and added series alike, for fitting the y axis to the new years
+    series = series_for([names[i] for i in keep] + added)
+    new_series = [item for item in series if item[0] in added]
+
+    total = sum(points[i] for i in keep) + sum(len(x) for _, x, _ in new_series)
+    webgl = use_webgl(total)
+    if webgl != use_webgl(sum(points)):
+        return None
+
+    patch = Patch()
+    for i in reversed(range(len(names))):
+        if i not in keep:
+            del patch['data'][i]
+    for name, x, y in new_series:
+        patch['data'].append(line_trace(x, y, name, webgl))
+    patch['layout']['xaxis']['range'] = list(years)
+    patch['layout']['yaxis']['range'] = y_range(series, years)
+    patch['layout']['title']['text'] = title
+
+    return patch, {
+        'names': [names[i] for i in keep] + [name for name, _, _ in new_series],
+        'points': [points[i] for i in keep] + [len(x) for _, x, _ in new_series],
+        'domain': domain,
+        'zoomed': False
+    }
@@ -0,0 +1,203 @@
+"""
+Retry policy for the upstream data fetches.
+
+Every request to an upstream host goes through call(), which retries
+transient failures with full-jitter exponential backoff, never waits or
+tries past the Deadline of the refresh it belongs to, and consults a
+circuit breaker per host. After BREAKER_FAILURES consecutive failed
+attempts the breaker opens and calls to that host fail at once for
+BREAKER_RESET seconds. A single trial request is then let through, which
+closes the breaker again if it succeeds. A refresh against a host that is
+down therefore fails in milliseconds instead of holding a worker thread
+through every timeout and backoff.
+
+Failures surface as UpstreamError. data_processor then keeps the last
+successfully processed dataset instead of writing anything new.
+"""
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from instrumentation import get_logger, metrics, timer
+
+logger = get_logger('resilience')
+
+# Attempts per fetch, first one included
+RETRY_ATTEMPTS = int(os.environ.get('CLIMATE_FETCH_RETRIES', 3))
+
+# Per-request timeout in seconds (connect and each read)
+REQUEST_TIMEOUT = float(os.environ.get('CLIMATE_FETCH_TIMEOUT', 10))
+
+# Backoff before retry n is uniform in [0, min(BACKOFF_MAX, BACKOFF_BASE * 2**n)]
+BACKOFF_BASE = float(os.environ.get('CLIMATE_FETCH_BACKOFF', 1.0))
+BACKOFF_MAX = 30.0
+
+# Seconds all fetches of one refresh may take together
+REFRESH_DEADLINE = float(os.environ.get('CLIMATE_REFRESH_DEADLINE', 600))
+
+# Consecutive failed attempts that open a host's breaker, and seconds it stays open
+BREAKER_FAILURES = int(os.environ.get('CLIMATE_BREAKER_FAILURES', 5))
+BREAKER_RESET = float(os.environ.get('CLIMATE_BREAKER_RESET', 300))
+
+metrics.describe('dashboard_upstream_requests_total', 'counter',
+                 'Upstream fetch attempts by host and outcome '
+                 '(ok, retry, failed, rejected, deadline, circuit_open)')
+metrics.describe('dashboard_upstream_request_seconds', 'histogram',
+                 'Time of a single upstream fetch attempt')
+metrics.describe('dashboard_circuit_transitions_total', 'counter',
+                 'Circuit breaker state changes by host and new state')
+
+
+class UpstreamError(RuntimeError):
+    """An upstream source could not be fetched (or parsed) within the retry policy"""
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX, rng=random):
+    """Full-jitter delay before retry number `attempt` (0 for the first retry)"""
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class Deadline:
+    """
+    Time budget shared by the fetches of one refresh. `cancel`, a
+    threading.Event, interrupts backoff waits when set (e.g. on shutdown).
+    """
+
+    def __init__(self, seconds=REFRESH_DEADLINE, cancel=None):
+        self.expires = None if seconds is None else time.monotonic() + seconds
+        self.cancel = cancel or threading.Event()
+
+    def remaining(self):
+        """Seconds left (None without a limit), 0 once cancelled"""
+        if self.cancel.is_set():
+            return 0.0
+        if self.expires is None:
+            return None
+        return max(self.expires - time.monotonic(), 0.0)
+
+    def expired(self):
+        return self.remaining() == 0
+
+    def timeout(self, default=REQUEST_TIMEOUT):
+        """Request timeout that does not outlast the deadline"""
+        remaining = self.remaining()
+        return default if remaining is None else min(default, remaining)
+
+    def sleep(self, seconds):
+        """
+        Wait before a retry; False, without waiting, when the wait would end
+        past the deadline, or as soon as the deadline is cancelled
+        """
+        remaining = self.remaining()
+        if remaining is not None and seconds >= remaining:
+            return False
+        return not self.cancel.wait(seconds)
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one upstream host"""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, host, failures=BREAKER_FAILURES, reset_after=BREAKER_RESET):
+        self.host = host
+        self.failures = failures
+        self.reset_after = reset_after
+        self.state = self.CLOSED
+        self._failed = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state):
+        self.state = state
+        metrics.inc('dashboard_circuit_transitions_total', host=self.host, state=state)
+        logger.warning("Circuit breaker state changed",
+                       extra={'fields': {'host': self.host, 'state': state}})
+
+    def allow(self):
+        """Whether a request may go out now; in half-open state only one trial at a time"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_after:
+                    return False
+                self._transition(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._trial:
+                    return False
+                self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failed = 0
+            self._trial = False
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failed += 1
+            self._trial = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED
+                                                and self._failed >= self.failures):
+                self._opened_at = time.monotonic()
+                self._transition(self.OPEN)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(url):
+    """The process-wide CircuitBreaker of a URL's host"""
+    host = urlsplit(url).netloc
+    with _breakers_lock:
+        current = _breakers.get(host)
+        if current is None:
+            current = _breakers[host] = CircuitBreaker(host)
+    return current
+
+
+def call(func, url, deadline=None, attempts=RETRY_ATTEMPTS, retryable=lambda error: True):
+    """
+    Return func(timeout), one request to url, retried under the policy.
+    Errors for which retryable(error) is false are not retried and do not
+    count against the host (the host answered). Raises UpstreamError.
+    """
+    deadline = deadline or Deadline(None)
+    circuit = breaker(url)
+    host = circuit.host
+    for attempt in range(attempts):
+        if deadline.expired():
+            metrics.inc('dashboard_upstream_requests_total', host=host, outcome='deadline')
+            raise UpstreamError(f"Deadline exceeded before fetching {url}")
+        if not circuit.allow():
+            metrics.inc('dashboard_upstream_requests_total', host=host, outcome='circuit_open')
+            raise UpstreamError(f"Circuit open for {host}, not fetching {url}")
+        try:
+            with timer('dashboard_upstream_request_seconds', host=host):
+                result = func(deadline.timeout())
+        except Exception as e:
+            if not retryable(e):
+                circuit.record_success()
+                metrics.inc('dashboard_upstream_requests_total', host=host, outcome='rejected')
+                raise UpstreamError(f"Fetching {url} failed: {e}") from e
+            circuit.record_failure()
+            if attempt == attempts - 1:
+                metrics.inc('dashboard_upstream_requests_total', host=host, outcome='failed')
+                raise UpstreamError(f"Fetching {url} failed after {attempts} attempts: {e}") from e
+            delay = backoff_delay(attempt)
+            metrics.inc('dashboard_upstream_requests_total', host=host, outcome='retry')
+            logger.warning("Upstream fetch failed, retrying", extra={'fields': {
+                'url': url, 'attempt': attempt + 1, 'delay_s': round(delay, 3), 'error': str(e)}})
+            if not deadline.sleep(delay):
+                metrics.inc('dashboard_upstream_requests_total', host=host, outcome='deadline')
+                raise UpstreamError(f"Deadline reached before retrying {url}: {e}") from e
+            continue
+        circuit.record_success()
+        metrics.inc('dashboard_upstream_requests_total', host=host, outcome='ok')
+        return result
+    raise UpstreamError(f"No attempts made to fetch {url}")
@@ -1,5 +1,41 @@
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+"""
+Threaded static file server for the snapshot written by export_static.py.
+
+    python simple_server.py [--port 8050] [--directory site]
+
+Each request is handled on its own thread over HTTP/1.1 keep-alive. A
+file's precompressed name.br or name.gz sibling is sent when the client
+accepts that encoding, with a strong ETag per representation (a content
+hash, cached per file and mtime), Cache-Control (a year, immutable, for
+Dash's fingerprinted bundles; revalidation for everything else), 304
+answers to If-None-Match and single byte ranges (Range, If-Range).
+"""
+import hashlib
+import os
+import re
 import socket
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+STATIC_DIR = os.environ.get('CLIMATE_STATIC_DIR', 'site')
+
+# Dash endpoints the renderer fetches on load, stored as extensionless JSON files
+DASH_ENDPOINTS = ('_dash-layout', '_dash-dependencies')
+
+# Accept-Encoding token -> suffix of the precompressed file, in preference order
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+BYTE_RANGE = re.compile(r'bytes=(\d*)-(\d*)')
+
+# Version fragment Dash inserts into bundle names, e.g. react@16.v2_14_2m1792193299.14.0.min.js
+FINGERPRINT = re.compile(r'\.v[\w-]+m[0-9a-fA-F]+\.')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+COPY_BUFFER = 64 * 1024
+
 
 def get_ip():
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -13,20 +49,187 @@ def get_ip():
         s.close()
     return IP
 
-def run(server_class=HTTPServer, handler_class=SimpleHTTPRequestHandler, port=8050):
+
+def accepted_encodings(header):
+    """Content codings an Accept-Encoding header allows (q > 0)"""
+    accepted = set()
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def parse_range(header, size):
+    """
+    (start, stop) of a single "bytes=" range against a file of `size`
+    bytes; None to ignore the header (malformed, or several ranges), and
+    ValueError when the range cannot be satisfied
+    """
+    match = BYTE_RANGE.fullmatch((header or '').strip())
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        start, stop = max(size - int(last), 0), size
+    else:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        stop = min(int(last) + 1, size) if last else size
+    if start >= stop:
+        raise ValueError(f"{header} against {size} bytes")
+    return start, stop
+
+
+class StaticHandler(SimpleHTTPRequestHandler):
+    """SimpleHTTPRequestHandler with content negotiation, validators and ranges"""
+
+    protocol_version = 'HTTP/1.1'
+    extensions_map = {**SimpleHTTPRequestHandler.extensions_map,
+                      '.js': 'application/javascript', '.json': 'application/json'}
+
+    # (path, mtime_ns, size) -> content hash, shared by all handler threads
+    _hashes = {}
+
+    def etag(self, path, stat):
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self._hashes.get(key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(partial(f.read, COPY_BUFFER), b''):
+                    sha.update(block)
+            digest = self._hashes[key] = sha.hexdigest()[:32]
+        return f'"{digest}"'
+
+    def guess_type(self, path):
+        if os.path.basename(path) in DASH_ENDPOINTS:
+            return 'application/json'
+        return super().guess_type(path)
+
+    def select(self, path):
+        """(file to send, Content-Encoding or None): a precompressed variant if accepted"""
+        if 'Range' not in self.headers:
+            accepted = accepted_encodings(self.headers.get('Accept-Encoding'))
+            for coding, suffix in ENCODINGS:
+                if coding in accepted and os.path.isfile(path + suffix):
+                    return path + suffix, coding
+        return path, None
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not self.path.split('?', 1)[0].endswith('/'):
+                # Let the base class redirect to the trailing-slash URL
+                return super().send_head()
+            path = os.path.join(path, 'index.html')
+        if not os.path.isfile(path) or path.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        filename, encoding = self.select(path)
+        f = open(filename, 'rb')
+        try:
+            stat = os.fstat(f.fileno())
+            tag = self.etag(filename, stat)
+            headers = {
+                'ETag': tag,
+                'Cache-Control': IMMUTABLE if FINGERPRINT.search(os.path.basename(path)) else REVALIDATE,
+                'Vary': 'Accept-Encoding',
+                'Accept-Ranges': 'bytes',
+                'Last-Modified': self.date_time_string(stat.st_mtime)
+            }
+            if encoding:
+                headers['Content-Encoding'] = encoding
+
+            # If-None-Match uses the weak comparison
+            matches = [t.strip().removeprefix('W/') for t in self.headers.get('If-None-Match', '').split(',')]
+            if tag in matches or '*' in matches:
+                f.close()
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_headers(headers)
+                return None
+
+            start, stop = 0, stat.st_size
+            status = HTTPStatus.OK
+            if_range = self.headers.get('If-Range')
+            if 'Range' in self.headers and (if_range is None or if_range.strip() == tag):
+                try:
+                    span = parse_range(self.headers['Range'], stat.st_size)
+                except ValueError:
+                    f.close()
+                    self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    self.send_headers({**headers, 'Content-Range': f'bytes */{stat.st_size}',
+                                       'Content-Length': '0'})
+                    return None
+                if span is not None:
+                    start, stop = span
+                    status = HTTPStatus.PARTIAL_CONTENT
+                    headers['Content-Range'] = f'bytes {start}-{stop - 1}/{stat.st_size}'
+
+            self.send_response(status)
+            self.send_headers({**headers, 'Content-Type': self.guess_type(path),
+                               'Content-Length': str(stop - start)})
+            f.seek(start)
+            self.remaining = stop - start
+            return f
+        except Exception:
+            f.close()
+            raise
+
+    def send_headers(self, headers):
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def copyfile(self, source, outputfile):
+        """Copy only the selected range of the file"""
+        remaining = self.remaining
+        while remaining > 0:
+            block = source.read(min(COPY_BUFFER, remaining))
+            if not block:
+                break
+            outputfile.write(block)
+            remaining -= len(block)
+
+
+class StaticServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def run(server_class=StaticServer, handler_class=StaticHandler, port=8050, directory=STATIC_DIR):
+    if not os.path.isdir(directory):
+        raise SystemExit(f"{directory} does not exist; build it with python export_static.py")
     server_address = ('', port)
-    httpd = server_class(server_address, handler_class)
-    
+    httpd = server_class(server_address, partial(handler_class, directory=directory))
+
     local_ip = get_ip()
-    print(f"Server started at:")
+    print(f"Serving {os.path.abspath(directory)} at:")
     print(f"* Local: http://localhost:{port}")
     print(f"* Network: http://{local_ip}:{port}")
-    
+
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
         print("\nShutting down server...")
         httpd.server_close()
 
+
 if __name__ == '__main__':
-    run() 
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--directory', default=STATIC_DIR,
+                        help='snapshot directory (default: %(default)s)')
+    args = parser.parse_args()
+    run(port=args.port, directory=args.directory)
@@ -0,0 +1,144 @@
+"""
+Startup modes and phase timing for the dashboard processes.
+
+CLIMATE_STARTUP selects how much work happens before a process accepts
+connections:
+
+    preload     load the datasets and build the default figures up front
+                (in the gunicorn master, shared by the forked workers)
+    background  accept connections immediately and warm up on a thread
+    lazy        do nothing up front; the first request pays for it
+
+Each startup step runs inside phase(), which logs its duration and keeps it
+for format_report(). `python startup.py [module]` imports a dashboard module,
+creates its app and prints the phase table; use `python -X importtime` on
+top of it for a per-module breakdown of the import phase.
+"""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from instrumentation import get_logger, metrics
+
+logger = get_logger('startup')
+
+STARTUP_MODES = ('preload', 'background', 'lazy')
+STARTUP_MODE = os.environ.get('CLIMATE_STARTUP', 'preload')
+if STARTUP_MODE not in STARTUP_MODES:
+    raise ValueError(f"CLIMATE_STARTUP={STARTUP_MODE!r}, expected one of {STARTUP_MODES}")
+
+metrics.describe('dashboard_startup_phase_seconds', 'histogram',
+                 'Duration of a process startup phase')
+
+_origin = time.perf_counter()
+_phases = []
+
+
+@contextmanager
+def phase(name):
+    """Time a startup step, log it and record it for the report"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        _phases.append((name, start - _origin, duration))
+        metrics.observe('dashboard_startup_phase_seconds', duration, phase=name)
+        logger.info("Startup phase finished", extra={'fields': {
+            'phase': name, 'duration_ms': round(duration * 1000, 1)}})
+
+
+def format_report():
+    """Phase table in the layout of `python -X importtime`: offset | self | phase"""
+    lines = ['startup: offset [ms] |   self [ms] | phase']
+    for name, offset, duration in sorted(_phases, key=lambda p: p[1]):
+        lines.append(f"startup: {offset * 1000:11.1f} | {duration * 1000:11.1f} | {name}")
+    return '\n'.join(lines)
+
+
+class Deferred:
+    """
+    Result of a startup step that runs now (preload), on a daemon thread
+    (background) or on the first call to result() (lazy)
+    """
+
+    def __init__(self, func, name, mode=None):
+        self.func = func
+        self.name = name
+        self.mode = mode or STARTUP_MODE
+        self._lock = threading.Lock()
+        self._started = False
+        self._event = threading.Event()
+        self._result = None
+        self._error = None
+
+        if self.mode == 'preload':
+            self._start()
+        elif self.mode == 'background':
+            threading.Thread(target=self._start, name=f"startup-{name}", daemon=True).start()
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        try:
+            with phase(self.name):
+                self._result = self.func()
+        except Exception as e:
+            logger.exception("Startup step failed", extra={'fields': {'phase': self.name}})
+            self._error = e
+        finally:
+            self._event.set()
+
+    def ready(self):
+        """True once the step has finished; lazy steps never hold up readiness"""
+        return self.mode == 'lazy' or self._event.is_set()
+
+    def result(self, timeout=None):
+        """Wait for the step (running it first in lazy mode) and return its result"""
+        if self.mode == 'lazy':
+            self._start()
+        if not self._event.wait(timeout):
+            raise TimeoutError(f"Startup step {self.name!r} still running")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def warm_up(func, name, mode=None):
+    """Run a startup step according to the startup mode, see Deferred"""
+    return Deferred(func, name, mode)
+
+
+def register_health(server, ready=None, path='/healthz'):
+    """
+    Health route answering as soon as the server is up. The response
+    reports whether warm-up has finished but stays 200 while it runs.
+    """
+    from flask import jsonify
+
+    def health_view():
+        return jsonify(status='ok', ready=ready() if ready else True, mode=STARTUP_MODE)
+
+    server.add_url_rule(path, 'healthz', health_view)
+    return server
+
+
+if __name__ == '__main__':
+    import importlib
+
+    # Record into the importable module, which the dashboard modules use
+    startup = importlib.import_module('startup')
+    module_name = sys.argv[1] if len(sys.argv) > 1 else 'minimal_app'
+    with startup.phase(f"import {module_name}"):
+        module = importlib.import_module(module_name)
+    if hasattr(module, 'preload'):
+        warming = startup.warm_up(module.preload, 'preload')
+    with startup.phase('create_app'):
+        module.create_app()
+    if hasattr(module, 'preload'):
+        warming.result()
+    print(startup.format_report())
@@ -0,0 +1,103 @@
+"""
+Vectorized synthetic data generators.
+
+Used for the demo weather events in data_processor (there is no upstream
+source for them yet) and to build large load-test fixtures. They never
+stand in for a failed download: data_processor keeps the last good
+dataset instead. Every generator takes a seedable np.random.Generator
+and produces whole arrays at once via broadcasting, so a 10k countries x
+500 years panel is generated in a few seconds and is reproducible.
+"""
+import numpy as np
+import pandas as pd
+
+from aggregates import MONTHS
+
+
+def make_rng(rng=None):
+    """Return rng unchanged if it is a Generator, otherwise seed a new one"""
+    if isinstance(rng, np.random.Generator):
+        return rng
+    return np.random.default_rng(rng)
+
+
+def synthetic_names(prefix, count):
+    """Stable placeholder names, e.g. 'Country 00001', for scaled fixtures"""
+    width = max(5, len(str(count)))
+    return [f"{prefix} {i:0{width}d}" for i in range(1, count + 1)]
+
+
+def temperature_series(years, rng=None, base=15.0, trend=0.01, noise=0.5):
+    """Yearly temperatures with a linear trend plus Gaussian noise"""
+    rng = make_rng(rng)
+    years = np.asarray(years)
+    temperatures = base + years * trend + rng.normal(0, noise, size=len(years))
+
+    return pd.DataFrame({
+        'Year': years,
+        'Temperature': temperatures,
+        'Type': 'Historical'
+    })
+
+
+def monthly_temperatures(years, rng=None, base=15.0, trend=0.01, noise=0.5):
+    """
+    GISS-shaped table (Year and one column per month, Jan..Dec) of monthly
+    temperatures with a linear trend plus Gaussian noise
+    """
+    rng = make_rng(rng)
+    years = np.asarray(years)
+    temperatures = base + years[:, None] * trend + rng.normal(0, noise, size=(len(years), 12))
+
+    table = pd.DataFrame(temperatures, columns=MONTHS)
+    table.insert(0, 'Year', years)
+    return table
+
+
+def emissions_panel(countries, years, rng=None, base_year=1900):
+    """
+    Country x year emissions with per-country base level, growth rate and
+    population, in long format (one row per country and year)
+    """
+    rng = make_rng(rng)
+    years = np.asarray(years)
+    n_countries, n_years = len(countries), len(years)
+
+    base_emissions = rng.uniform(100, 1000, n_countries)[:, None]
+    growth_rate = rng.uniform(1.01, 1.03, n_countries)[:, None]
+    population_base = rng.uniform(10e6, 500e6, n_countries)[:, None]
+
+    elapsed = (years - base_year)[None, :]
+    emissions = base_emissions * growth_rate ** elapsed
+    population = population_base * 1.01 ** elapsed
+
+    codes = np.repeat(np.arange(n_countries), n_years)
+    return pd.DataFrame({
+        'country': pd.Categorical.from_codes(codes, categories=list(countries)),
+        'year': np.tile(years, n_countries),
+        'co2': emissions.ravel(),
+        'population': population.ravel(),
+        'co2_per_capita': (emissions / population * 1e6).ravel()
+    })
+
+
+def weather_events(event_types, years, rng=None, base_year=1990, base=10.0,
+                   growth=0.5, noise=2.0):
+    """
+    Year x event type counts with an increasing trend, in long format
+    ordered by year then event type
+    """
+    rng = make_rng(rng)
+    years = np.asarray(years)
+    n_years, n_types = len(years), len(event_types)
+
+    expected = (base + (years - base_year) * growth)[:, None]
+    counts = np.trunc(rng.normal(expected, noise, size=(n_years, n_types)))
+    counts = np.clip(counts, 0, None).astype('int64')
+
+    codes = np.tile(np.arange(n_types), n_years)
+    return pd.DataFrame({
+        'Year': np.repeat(years, n_types),
+        'Event_Type': pd.Categorical.from_codes(codes, categories=list(event_types)),
+        'Count': counts.ravel()
+    })
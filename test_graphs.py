@@ -2,26 +2,28 @@ print("Starting test graphs...")
 
 import dash
 from dash import html, dcc
-import pandas as pd
 import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
 
+import data_store
+
 # Initialize the app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
 # Load emissions data
 print("\nLoading emissions data...")
-emissions_df = pd.read_csv('data/emissions_data.csv')
+emissions_df = data_store.registry.get('emissions')
 print(f"Emissions data loaded with shape: {emissions_df.shape}")
+emissions_series = data_store.registry.series('emissions')
 
 # Create emissions figure
 emissions_fig = go.Figure()
-for country in ['United States', 'China', 'India', 'Russian Federation', 'Japan']:
-    df_country = emissions_df[emissions_df['country'] == country]
+for country in ['United States', 'China', 'India', 'Russia', 'Japan']:
+    years, co2 = emissions_series.get(country, 'co2')
     emissions_fig.add_trace(
         go.Scatter(
-            x=df_country['year'],
-            y=df_country['co2'],
+            x=years,
+            y=co2,
             name=country,
             mode='lines+markers'
         )
@@ -35,17 +37,18 @@ emissions_fig.update_layout(
 
 # Load weather data
 print("\nLoading weather data...")
-weather_df = pd.read_csv('data/weather_events.csv')
+weather_df = data_store.registry.get('weather')
 print(f"Weather data loaded with shape: {weather_df.shape}")
+weather_series = data_store.registry.series('weather')
 
 # Create weather figure
 weather_fig = go.Figure()
-for event in weather_df['Event_Type'].unique():
-    df_event = weather_df[weather_df['Event_Type'] == event]
+for event in weather_series.keys:
+    years, counts = weather_series.get(event, 'Count')
     weather_fig.add_trace(
         go.Scatter(
-            x=df_event['Year'],
-            y=df_event['Count'],
+            x=years,
+            y=counts,
             name=event,
             mode='lines+markers'
         )
@@ -0,0 +1,83 @@
+"""
+Conditional GETs through the HTTP cache, against a local stand-in for the
+upstream hosts.
+
+    python -m pytest -q test_http_cache.py
+"""
+import os
+
+import pytest
+
+import data_processor
+from benchmarks.fixtures import GISS_FILE, OWID_FILE, write_fixtures
+from benchmarks.harness import StandInServer
+from http_cache import HTTPCache
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    """Stand-in server for the GISS and OWID hosts, with data_processor pointed at it"""
+    directory = tmp_path / 'upstream'
+    write_fixtures(str(directory), owid_countries=5)
+    with StandInServer(str(directory)) as server:
+        monkeypatch.setattr(data_processor, 'GISS_TEMPERATURE_URL', server.url(GISS_FILE))
+        monkeypatch.setattr(data_processor, 'OWID_CO2_URL', server.url(OWID_FILE))
+        yield server
+
+
+def mtimes(data_dir, names):
+    return {name: os.stat(os.path.join(data_dir, data_processor.DATASET_FILES[name])).st_mtime_ns
+            for name in names}
+
+
+def test_200_stores_validators_and_304_reuses_body(upstream, tmp_path):
+    cache = HTTPCache(str(tmp_path / 'cache'))
+    url = upstream.url(GISS_FILE)
+
+    first = data_processor.fetch_with_retry(url, cache=cache)
+    assert first.status_code == 200
+    assert not first.not_modified
+    meta = cache.load_meta(url)
+    assert meta['last_modified'] == first.headers['Last-Modified']
+    assert cache.conditional_headers(url) == {'If-Modified-Since': meta['last_modified']}
+
+    second = data_processor.fetch_with_retry(url, cache=cache)
+    assert second.not_modified and second.from_cache
+    assert second.content == first.content
+
+
+def test_streamed_304_reuses_body(upstream, tmp_path):
+    cache = HTTPCache(str(tmp_path / 'cache'))
+    url = upstream.url(OWID_FILE)
+
+    first = data_processor.fetch_with_retry(url, cache=cache, stream=True)
+    assert not first.not_modified
+    second = data_processor.fetch_with_retry(url, cache=cache, stream=True)
+    assert second.not_modified
+    with data_processor.open_body(first) as a, data_processor.open_body(second) as b:
+        assert a.read() == b.read()
+
+
+def test_unchanged_upstream_skips_processing(upstream, tmp_path):
+    cache = HTTPCache(str(tmp_path / 'cache'))
+    assert data_processor.fetch_temperature_data(cache=cache, skip_unchanged=True) is not None
+    assert data_processor.fetch_temperature_data(cache=cache, skip_unchanged=True) is None
+    assert data_processor.fetch_co2_emissions(cache=cache) is not None
+    assert data_processor.fetch_co2_emissions(cache=cache, skip_unchanged=True) is None
+
+
+def test_refresh_keeps_unchanged_outputs_unless_forced(upstream, tmp_path):
+    cache = HTTPCache(str(tmp_path / 'cache'))
+    data_dir = str(tmp_path / 'data')
+    names = ('temperature', 'temperature_monthly', 'emissions', 'geo', 'weather')
+
+    data_processor.process_and_save_data(cache=cache, data_dir=data_dir, with_database=False)
+    written = mtimes(data_dir, names)
+
+    data_processor.process_and_save_data(cache=cache, data_dir=data_dir, with_database=False)
+    assert mtimes(data_dir, names) == written
+
+    data_processor.process_and_save_data(cache=cache, data_dir=data_dir, with_database=False,
+                                         force=True)
+    forced = mtimes(data_dir, names)
+    assert all(forced[name] != written[name] for name in names)
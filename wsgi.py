@@ -0,0 +1,22 @@
+"""
+WSGI entry point for the dashboard.
+
+    gunicorn -c gunicorn.conf.py wsgi:server
+
+The warm-up (loading the datasets and building the default figures) runs
+according to CLIMATE_STARTUP, see startup.py. In the default preload mode
+gunicorn.conf.py sets preload_app, so this module is imported once in the
+gunicorn master and every worker starts with the data and figures already
+in memory (shared copy-on-write). In background mode each worker accepts
+connections at once and warms up on a thread; /healthz reports when it is
+done.
+"""
+from startup import phase, warm_up
+
+with phase('import minimal_app'):
+    from minimal_app import create_app, preload
+
+warming = warm_up(preload, 'preload')
+with phase('create_app'):
+    app = create_app(ready=warming.ready)
+server = app.server